@@ -1,38 +1,179 @@
-from flask import Flask, request, send_file, jsonify
+from flask import Flask, request, send_from_directory, jsonify
 from flask_cors import CORS
-from PIL import Image, ImageFilter, ImageDraw, ImageFont, UnidentifiedImageError, ImageEnhance
-import requests
+from PIL import Image, ImageFilter, ImageDraw, ImageFont, ImageEnhance, ImageStat
+from PIL import __version__ as PILLOW_VERSION, features as pil_features
 import io
 import os
-import tempfile
-import mimetypes
 import logging
 import json
 import time
 import asyncio
-from io import BytesIO
-import base64
-from werkzeug.exceptions import BadRequest
+import atexit
+import threading
 
 # For Runware SDK
 import uuid
 import aiohttp
 from dotenv import load_dotenv
 import math
+import random
+import functools
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+try:
+    import orjson  # Optional: faster JSON encoding for Runware payloads
+except ImportError:
+    orjson = None
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Report which Pillow build is doing the compositing work; Pillow-SIMD is a drop-in
+# replacement whose versions carry a ".post" suffix
+logger.info(f"Pillow {PILLOW_VERSION} (SIMD build: {'.post' in PILLOW_VERSION}, "
+            f"libjpeg-turbo: {pil_features.check_feature('libjpeg_turbo')})")
+
 # Load environment variables if any
 load_dotenv()
 print(f"load_dotenv() executed.") # See if this line runs
 print(f"Value for RUNWARE_API_KEY from os.getenv: {os.getenv('RUNWARE_API_KEY')}")
 
-app = Flask(__name__)
+# Flask's built-in static route is disabled: it would shadow serve_static below
+app = Flask(__name__, static_folder=None)
 CORS(app)  # Enable CORS for all routes
 
-# Runware SDK client implementation for Flask (non-async wrapper)
+# Directory the rendered pins are saved to and served from, created once at startup
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+os.makedirs(STATIC_DIR, exist_ok=True)
+
+# zlib level for the saved PNGs; level 1 encodes ~3x faster than Pillow's default
+# of 6 for files only ~10% larger
+PNG_COMPRESS_LEVEL = int(os.getenv('PNG_COMPRESS_LEVEL', 1))
+
+def _json_dumps(obj):
+    """Serializes obj to JSON bytes, using orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode('utf-8')
+
+# Fixed part of every Runware image inference task
+RUNWARE_TASK_TEMPLATE = {
+    "taskType": "imageInference",
+    "negativePrompt": "low quality, bad anatomy, distorted, blurry",
+    "steps": 35,
+    "CFGScale": 7.0,
+    "outputType": ["URL"],
+    "outputFormat": "JPEG",
+    "numberResults": 1,
+    "includeCost": True
+}
+
+# On-disk cache of generated Runware images, keyed by the full task parameters.
+# Set RUNWARE_CACHE_MAX_BYTES=0 to disable it.
+RUNWARE_CACHE_DIR = os.getenv('RUNWARE_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'runware'))
+RUNWARE_CACHE_MAX_BYTES = int(os.getenv('RUNWARE_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+RUNWARE_CACHE_MAX_AGE = int(os.getenv('RUNWARE_CACHE_MAX_AGE', 7 * 24 * 3600))
+
+def _format_runware_error(status_code, response_text):
+    """Builds the exception for a failed Runware task creation.
+
+    Args:
+        status_code (int): The HTTP status of the response
+        response_text (str): The response body
+
+    Returns:
+        Exception: The error to raise, listing the API's error codes when it sent any
+    """
+    if status_code == 401 or status_code == 403:
+        return Exception(f"Authentication failed. Your API key may be invalid. Status: {status_code}")
+    
+    error_text = response_text
+    try:
+        error_json = json.loads(response_text)
+        if error_json.get("errors"):
+            error_text = ", ".join(
+                f"{error.get('code', 'Unknown')}: {error.get('message', 'No message')}"
+                for error in error_json["errors"]
+            )
+    except (ValueError, AttributeError, TypeError):
+        pass  # Not the usual JSON error shape; report the raw body
+    return Exception(f"Failed to create task: {error_text}")
+
+def _runware_cache_path(prompt, width, height, model):
+    """Returns the cache file path for a generation request.
+
+    The key covers the fixed task template too, so changing e.g. the step count
+    does not serve stale images.
+    """
+    key_source = json.dumps({'p': prompt, 'w': width, 'h': height, 'm': model, 't': RUNWARE_TASK_TEMPLATE}, sort_keys=True)
+    key = hashlib.sha256(key_source.encode('utf-8')).hexdigest()
+    return os.path.join(RUNWARE_CACHE_DIR, f"{key}.jpg")
+
+def _read_runware_cache(path):
+    """Returns the cached image bytes, or None on a miss or an expired entry."""
+    if RUNWARE_CACHE_MAX_BYTES <= 0:
+        return None
+    try:
+        stat = os.stat(path)
+        if time.time() - stat.st_mtime > RUNWARE_CACHE_MAX_AGE:
+            return None
+        with open(path, 'rb') as f:
+            data = f.read()
+        # Record the access time explicitly (mtime keeps the creation time for max-age);
+        # the eviction sweep drops the least recently used entries first
+        os.utime(path, (time.time(), stat.st_mtime))
+        return data
+    except OSError:
+        return None
+
+def _write_runware_cache(path, data):
+    """Atomically stores image bytes in the cache, then trims the cache to size."""
+    if RUNWARE_CACHE_MAX_BYTES <= 0:
+        return
+    try:
+        os.makedirs(RUNWARE_CACHE_DIR, exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        _sweep_runware_cache()
+    except OSError as e:
+        logger.warning(f"Could not write Runware cache entry {path}: {e}")
+
+def _sweep_runware_cache():
+    """Removes expired entries, then least recently used ones until under RUNWARE_CACHE_MAX_BYTES."""
+    now = time.time()
+    entries = []
+    total_size = 0
+    with os.scandir(RUNWARE_CACHE_DIR) as it:
+        for entry in it:
+            if not entry.name.endswith('.jpg'):
+                continue
+            # Entries may vanish at any point, e.g. when another request sweeps too
+            try:
+                stat = entry.stat()
+                if now - stat.st_mtime > RUNWARE_CACHE_MAX_AGE:
+                    os.remove(entry.path)
+                    continue
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_atime, stat.st_size, entry.path))
+            total_size += stat.st_size
+    
+    entries.sort()
+    for _, size, path in entries:
+        if total_size <= RUNWARE_CACHE_MAX_BYTES:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass  # Already gone, which frees its space all the same
+        total_size -= size
+
+# Runware SDK client implementation for Flask (non-async wrapper around aiohttp)
 class RunwareClient:
     def __init__(self, api_key):
         self.api_key = api_key
@@ -40,13 +181,66 @@ class RunwareClient:
         self.headers = {
             "Authorization": f"Bearer {api_key}",
             "Content-Type": "application/json",
-            "Accept": "application/json"
+            "Accept": "application/json",
+            "Accept-Encoding": "gzip, deflate"
         }
+        # One HTTP session (and so one keep-alive connection pool) for the lifetime
+        # of the client. An aiohttp session is bound to the event loop that created
+        # it, while Flask runs every async view in a fresh loop, so the session lives
+        # on a dedicated background loop and requests are handed over to it.
+        self._loop = None
+        self._loop_lock = threading.Lock()
+        self._session = None
     
     def generate_image(self, prompt, width=1152, height=2048, model="rundiffusion:130@100"):
         """Generate an image using Runware API with blocking implementation for Flask"""
+        return asyncio.run(self.generate_image_async(prompt, width=width, height=height, model=model))
+    
+    def _get_loop(self):
+        """Start the background event loop that owns the shared session on first use"""
+        with self._loop_lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name='runware-io', daemon=True).start()
+                self._loop = loop
+                atexit.register(self.close)
+        return self._loop
+    
+    def _get_session(self):
+        """Return the shared aiohttp session, creating it lazily (must run on the background loop)"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=50, ttl_dns_cache=300)
+            self._session = aiohttp.ClientSession(connector=connector, headers=self.headers)
+        return self._session
+    
+    def close(self):
+        """Close the shared session and stop the background loop"""
+        if self._loop is None:
+            return
+        if self._session is not None:
+            asyncio.run_coroutine_threadsafe(self._session.close(), self._loop).result(timeout=5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+    
+    async def generate_image_async(self, prompt, width=1152, height=2048, model="rundiffusion:130@100"):
+        """Generate an image using Runware API without blocking the event loop"""
         logger.info(f"Generating image with prompt: {prompt}")
         
+        # Serve repeated prompts from the on-disk cache
+        cache_path = _runware_cache_path(prompt, width, height, model)
+        cached = _read_runware_cache(cache_path)
+        if cached is not None:
+            logger.info(f"Serving cached Runware image {os.path.basename(cache_path)}")
+            return cached
+        
+        # Run the HTTP work on the loop that owns the shared session
+        future = asyncio.run_coroutine_threadsafe(
+            self._generate_image_uncached(prompt, width, height, model), self._get_loop())
+        image_data = await asyncio.wrap_future(future)
+        _write_runware_cache(cache_path, image_data)
+        return image_data
+    
+    async def _generate_image_uncached(self, prompt, width, height, model):
+        """Create a Runware task and return the generated image bytes"""
         # Create a unique taskUUID for this request
         task_uuid = str(uuid.uuid4())
         logger.info(f"Generated taskUUID: {task_uuid}")
@@ -54,57 +248,41 @@ class RunwareClient:
         # Create the task payload according to the API documentation
         # This must be in an array format even for a single task
         payload = [{
-            "taskType": "imageInference",
+            **RUNWARE_TASK_TEMPLATE,
             "taskUUID": task_uuid,
             "positivePrompt": prompt,
-            "negativePrompt": "low quality, bad anatomy, distorted, blurry",
             "height": height,
             "width": width,
-            "model": model,
-            "steps": 35,
-            "CFGScale": 7.0,
-            "outputType": ["URL"],
-            "outputFormat": "JPEG",
-            "numberResults": 1,
-            "includeCost": True
+            "model": model
         }]
+        body = _json_dumps(payload)
         
         try:
+            session = self._get_session()
             # Log what we're about to send
             logger.info(f"Sending task creation request to Runware API")
-            logger.info(f"Request payload: {json.dumps(payload)}")
+            if logger.isEnabledFor(logging.INFO):
+                logger.info(f"Request payload: {body.decode('utf-8')}")
             
-            # Create the task
-            response = requests.post(
+            # Create the task (Content-Type: application/json comes from the session headers)
+            async with session.post(
                 f"{self.base_url}/tasks",
-                headers=self.headers,
-                json=payload,
-                timeout=30
-            )
+                data=body,
+                timeout=aiohttp.ClientTimeout(total=30)
+            ) as response:
+                status_code = response.status
+                response_text = await response.text()
             
             # Log response
-            logger.info(f"Task creation response status: {response.status_code}")
-            logger.info(f"Response content: {response.text}")
+            logger.info(f"Task creation response status: {status_code}")
+            logger.info(f"Response content: {response_text}")
             
             # Check for API-specific errors
-            if response.status_code == 401 or response.status_code == 403:
-                raise Exception(f"Authentication failed. Your API key may be invalid. Status: {response.status_code}")
-            elif response.status_code != 200:
-                error_text = response.text
-                try:
-                    error_json = response.json()
-                    if "errors" in error_json and error_json["errors"]:
-                        error_details = []
-                        for error in error_json["errors"]:
-                            error_msg = f"{error.get('code', 'Unknown')}: {error.get('message', 'No message')}"
-                            error_details.append(error_msg)
-                        error_text = ", ".join(error_details)
-                except:
-                    pass
-                raise Exception(f"Failed to create task: {error_text}")
+            if status_code != 200:
+                raise _format_runware_error(status_code, response_text)
             
             # Parse the response
-            response_data = response.json()
+            response_data = json.loads(response_text)
             logger.info(f"Parsed response data: {json.dumps(response_data)}")
             
             # Check if there's data in the response
@@ -119,50 +297,82 @@ class RunwareClient:
                 logger.info(f"Image URL from response: {image_url}")
                 
                 # Download the image
-                logger.info(f"Downloading image from URL: {image_url}")
-                img_response = requests.get(image_url, timeout=30)
-                
-                if img_response.status_code != 200:
-                    raise Exception(f"Failed to download generated image: {img_response.status_code}")
-                
-                return img_response.content
+                return await self._download_image(session, image_url)
             else:
                 # No image URL - we might need to poll for completion
                 logger.info("No immediate image URL - proceeding to poll for task completion")
-                return self._poll_for_completion(task_uuid)
+                return await self._poll_for_completion(session, task_uuid)
             
         except Exception as e:
             logger.exception(f"Error in generate_image: {str(e)}")
             raise
     
-    def _poll_for_completion(self, task_uuid):
+    async def _download_image(self, session, image_url):
+        """Download the generated image and return its bytes"""
+        logger.info(f"Downloading image from URL: {image_url}")
+        async with session.get(image_url, timeout=aiohttp.ClientTimeout(total=30)) as img_response:
+            if img_response.status != 200:
+                raise Exception(f"Failed to download generated image: {img_response.status}")
+            
+            # Stream the body in chunks over the pooled connection
+            image_buffer = io.BytesIO()
+            async for chunk in img_response.content.iter_chunked(64 * 1024):
+                image_buffer.write(chunk)
+            
+            return image_buffer.getvalue()
+    
+    async def _poll_for_completion(self, session, task_uuid):
         """Poll for task completion and return the image data"""
         logger.info(f"Polling for completion of task: {task_uuid}")
         
-        max_polls = 30
-        for i in range(max_polls):
-            logger.info(f"Polling attempt {i+1}/{max_polls}")
+        # Exponential backoff: poll densely at first, then taper off
+        initial_delay = 0.05  # First poll happens almost immediately
+        backoff_base = 1.3
+        max_delay = 5.0  # Longest wait between two regular polls
+        max_error_delay = 60.0  # Longest wait after repeated errors
+        max_wait = 60.0  # Wall-time budget for the whole polling phase
+        
+        started_at = time.monotonic()
+        attempt = 0
+        consecutive_errors = 0
+        while True:
+            elapsed = time.monotonic() - started_at
+            if elapsed >= max_wait:
+                break
+            
+            delay = min(max_delay, initial_delay * backoff_base ** attempt)
+            if consecutive_errors:
+                # Back off harder while the API keeps failing
+                delay = min(max_error_delay, delay * 2 ** consecutive_errors)
+            # +/-10% jitter, so tasks started together do not poll the API in lockstep
+            delay *= 1 + random.uniform(-0.1, 0.1)
+            
+            attempt += 1
             
             try:
-                # Wait before polling
-                if i > 0:
-                    time.sleep(2)
+                # Wait before polling without blocking the event loop
+                await asyncio.sleep(min(delay, max_wait - elapsed))
+                logger.info(f"Polling attempt {attempt} ({time.monotonic() - started_at:.1f}s elapsed)")
                 
                 # Get task status
-                response = requests.get(
+                async with session.get(
                     f"{self.base_url}/tasks/{task_uuid}",
-                    headers=self.headers,
-                    timeout=15
-                )
+                    timeout=aiohttp.ClientTimeout(total=15)
+                ) as response:
+                    status_code = response.status
+                    response_text = await response.text()
                 
-                logger.info(f"Poll response status: {response.status_code}")
+                logger.info(f"Poll response status: {status_code}")
                 
-                if response.status_code != 200:
-                    logger.warning(f"Failed to get task status: {response.text}")
+                if status_code != 200:
+                    logger.warning(f"Failed to get task status: {response_text}")
+                    consecutive_errors += 1
                     continue
                 
+                consecutive_errors = 0
+                
                 # Parse response
-                response_data = response.json()
+                response_data = json.loads(response_text)
                 
                 if "data" not in response_data:
                     logger.warning(f"Unexpected response format: {json.dumps(response_data)}")
@@ -182,15 +392,8 @@ class RunwareClient:
                     else:
                         raise Exception("No image URL found in completed task")
                     
-                    logger.info(f"Downloading image from URL: {image_url}")
-                    
                     # Download the image
-                    img_response = requests.get(image_url, timeout=30)
-                    
-                    if img_response.status_code != 200:
-                        raise Exception(f"Failed to download generated image: {img_response.status_code}")
-                    
-                    return img_response.content
+                    return await self._download_image(session, image_url)
                     
                 elif task_data.get("status") == "failed":
                     error = task_data.get("error", "Unknown error")
@@ -199,15 +402,16 @@ class RunwareClient:
                 else:
                     logger.info(f"Task status: {task_data.get('status', 'unknown')}")
             
-            except requests.exceptions.RequestException as e:
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
                 logger.error(f"Request error during polling: {str(e)}")
+                consecutive_errors += 1
                 # Continue polling despite errors
             except Exception as e:
                 if "Task failed" in str(e) or "No image URL found" in str(e):
                     raise
                 logger.error(f"Error during polling: {str(e)}")
         
-        raise Exception(f"Timed out waiting for task completion after {max_polls} attempts")
+        raise Exception(f"Timed out waiting for task completion after {attempt} attempts ({max_wait:.0f}s)")
 
 # Initialize Runware client using environment variable
 runware_api_key_from_env = os.getenv("RUNWARE_API_KEY")
@@ -219,9 +423,28 @@ else:
     runware_client = RunwareClient(api_key=runware_api_key_from_env)
 
 # --- Font Loading Helper ---
+@functools.lru_cache(maxsize=128)
+def _load_truetype(font_path, size):
+    """Parses a TrueType/OpenType font once per (path, size) and reuses it."""
+    return ImageFont.truetype(font_path, size)
+
+def _scan_bundled_fonts(base_path='font/'):
+    """Lists the bundled font files once so lookups don't need a stat per request."""
+    try:
+        return {name: os.path.join(base_path, name) for name in os.listdir(base_path)}
+    except OSError as e:
+        logger.warning(f"Could not scan bundled font directory {base_path}: {e}")
+        return {}
+
+# Bundled fonts available at startup, keyed by filename
+_AVAILABLE_FONTS = _scan_bundled_fonts()
+
 def load_bundled_font(font_names, size):
     """Attempts to load a font from the 'font/' directory in the given order.
 
+    Results are cached per (font_names, size), so repeated calls with the same
+    preferences return the already-parsed font object.
+
     Args:
         font_names (list): A list of font filenames (e.g., ['font1.ttf', 'font2.otf']).
         size (int): The desired font size.
@@ -229,15 +452,18 @@ def load_bundled_font(font_names, size):
     Returns:
         ImageFont: A Pillow font object, falling back to default if none are found.
     """
-    base_path = 'font/'
+    return _load_bundled_font_cached(tuple(font_names), size)
+
+@functools.lru_cache(maxsize=128)
+def _load_bundled_font_cached(font_names, size):
     for font_name in font_names:
         try:
-            font_path = os.path.join(base_path, font_name)
-            if os.path.exists(font_path):
+            font_path = _AVAILABLE_FONTS.get(font_name)
+            if font_path:
                 logger.info(f"Loading font: {font_path} at size {size}")
-                return ImageFont.truetype(font_path, size)
+                return _load_truetype(font_path, size)
             else:
-                 logger.warning(f"Bundled font not found: {font_path}")
+                 logger.warning(f"Bundled font not found: {font_name}")
         except IOError as e:
             logger.warning(f"Could not load font {font_name}: {e}")
         except Exception as e:
@@ -252,7 +478,7 @@ def load_bundled_font(font_names, size):
         try:
             logger.info(f"Attempting system fallback: {fallback_name} at size {size}")
             # Try loading directly by name, letting Pillow search
-            return ImageFont.truetype(fallback_name, size)
+            return _load_truetype(fallback_name, size)
         except IOError:
             # This specific font name wasn't found or readable by Pillow
             logger.warning(f"System fallback font '{fallback_name}' not found or loadable by Pillow.")
@@ -277,1338 +503,1590 @@ def load_bundled_font(font_names, size):
         # but text drawing will likely fail later.
         return None 
 
-@app.route('/generate-image', methods=['POST'])
-def generate_image():
-    # Add check for client availability
-    if runware_client is None:
-        return jsonify({"error": "Runware client is not configured due to missing API key."}), 503 # 503 Service Unavailable
+# --- Pin Layout ---
+# Size of the rendered pin (Pinterest's 2:3 aspect ratio)
+PIN_SIZE = (1000, 1500)
+# Runware only accepts multiples of 64, so the background is requested at PIN_SIZE
+# rounded up to those (1024x1536); it then only needs a slight downscale
+RUNWARE_IMAGE_SIZE = tuple(-(-side // 64) * 64 for side in PIN_SIZE)
+# Title font sizes tried by fit_font_size, largest first
+BASE_TITLE_FONT_SIZE = 80
+MIN_TITLE_FONT_SIZE = 30
+TITLE_FONT_SIZE_STEP = 5
 
-    # Parse request
-    data = request.json
-    if not data:
-        return jsonify({"error": "No JSON data provided"}), 400
+# --- Font Preferences ---
+# Title font preferences shared by all styles
+MAIN_FONT_PREFERENCES = (
+    'PoetsenOne-Regular.ttf', 'LeagueSpartan-Bold.ttf', 'Montserrat-Bold.ttf',
+    'Lato-Bold.ttf', 'OpenSans-Bold.ttf', 'Poppins-Bold.ttf',
+    'arialbd.ttf', 'Arial-Bold.ttf'
+)
+BRANDING_FONT_PREFERENCES = (
+    'DejaVuSans-Light.ttf', 'Calibril.ttf', 'seguisli.ttf',
+    'LeagueSpartan-Light.ttf', 'Montserrat-Light.ttf', 'Lato-Light.ttf',
+    'OpenSans-Light.ttf', 'Poppins-Light.ttf', 'arial.ttf'
+)
+
+# Style 1 title (and branding) font preferences
+STYLE1_FONT_PREFERENCES = ('LeagueSpartan-Bold.ttf', 'Montserrat-Bold.ttf')
+
+# Style 2 title and branding font preferences
+STYLE2_FONT_PREFERENCES = ('EBGaramond-Bold.ttf',)
+STYLE2_BRANDING_FONT_PREFERENCES = ('EBGaramond-Bold.ttf', 'LeagueSpartan-Bold.ttf', 'Montserrat-Bold.ttf')
+
+# Style 3 specific font preferences
+STYLE3_FONT_PREFERENCES = (
+    'Nunito-ExtraBold.ttf', 'Montserrat-ExtraBold.ttf', 'OpenSans-ExtraBold.ttf',
+    'Lato-Bold.ttf', 'Poppins-Bold.ttf'
+)
+
+# Style 3 bottom bar: it holds the branding URL, and the Read More button sits above it
+STYLE3_BOTTOM_BAR_HEIGHT = 180
+STYLE3_BRANDING_FONT_SIZE = 60  # Very large for visibility
+
+# Style 4 specific font preferences
+STYLE4_FONT_PREFERENCES = (
+    'Vidaloka-Regular.ttf', 'Times New Roman Bold.ttf', 'Georgia Bold.ttf',
+    'PlayfairDisplay-Bold.ttf', 'Merriweather-Bold.ttf'
+)
+
+# Style 5 specific font preferences - using LeagueSpartan-Bold for title as specified
+STYLE5_FONT_PREFERENCES = (
+    'LeagueSpartan-Bold.ttf', 'Montserrat-Bold.ttf', 'OpenSans-Bold.ttf',
+    'Lato-Bold.ttf', 'Arial-Bold.ttf', 'arialbd.ttf'
+)
+
+# "Read More" button look per style (styles 4 and 5 have no button)
+READ_MORE_BUTTON_STYLES = {
+    'style1': {
+        'font_preferences': STYLE1_FONT_PREFERENCES,  # Same font as the title
+        'button_color': (200, 200, 200, 240),  # Light gray with higher opacity
+        'text_color': (80, 80, 80),  # Darker gray text
+        'y_fraction': 0.88,  # 88% down the image (changed from 80%)
+    },
+    'style2': {
+        'font_preferences': ('EBGaramond-Bold.ttf', 'LeagueSpartan-Bold.ttf'),  # Matches the title
+        'button_color': (230, 220, 180, 240),  # Cream color that complements the gold
+        'text_color': (90, 80, 50),  # Dark gold/brown text
+        'y_fraction': 0.85,  # 85% down the image
+    },
+    'style3': {
+        'font_preferences': STYLE3_FONT_PREFERENCES,  # Same font as the title
+        'button_color': (220, 220, 220, 240),  # Light gray to contrast with the black box
+        'text_color': (50, 50, 50),  # Nearly black text for good contrast
+        'y_fraction': None,  # Placed above the bottom black box instead
+    },
+}
+
+# --- Drawing Helpers ---
+@functools.lru_cache(maxsize=2048)
+def measure_text(text, font_obj):
+    """Measures text once per (text, font) pair.
+
+    Fonts come from the font cache, so the same pair recurs across the layout
+    pass, the drawing pass and later requests; each FreeType layout runs once.
+
+    Args:
+        text (str): The text to measure.
+        font_obj (ImageFont): The font used to measure the text.
+
+    Returns:
+        tuple: (advance width, bounding box) as given by getlength/getbbox.
+    """
+    return font_obj.getlength(text), font_obj.getbbox(text)
+
+def compute_top_title_y(total_text_height, canvas_height):
+    """Returns the title y for the top-anchored layouts (Styles 1 and 2).
+
+    Args:
+        total_text_height (float): The height of the wrapped title block.
+        canvas_height (int): The height of the image.
+
+    Returns:
+        float: The top y position of the title.
+    """
+    text_y = 80  # Fixed position from top with good padding
     
-    # Get parameters with the requested names
-    image_prompt = data.get('image_prompt')
-    title = data.get('title')
-    branding_url = data.get('BrandingURL', '')  # Optional parameter for branding/URL footer
-    style = data.get('Style', 'style1')  # Default to style1 if not provided
+    # Check if text might be too close to bottom elements
+    if text_y + total_text_height > canvas_height - 200:
+        # If text is very long and would overlap with bottom elements, adjust as needed
+        text_y = max(40, canvas_height - 200 - total_text_height)
+    return text_y
+
+def compute_style5_title_y(total_text_height, canvas_height):
+    """Returns the title y for Style 5, centered in the curved dark section.
+
+    Args:
+        total_text_height (float): The height of the wrapped title block.
+        canvas_height (int): The height of the image.
+
+    Returns:
+        float: The top y position of the title.
+    """
+    # We want to center it vertically in the dark section, adjusting for the curve
+    dark_section_height = 550  # Must match the value from the style5 implementation
+    curve_height = 100  # Must match the value from the style5 implementation
     
-    # Validate required fields
-    if not image_prompt:
-        return jsonify({"error": "Missing image_prompt parameter"}), 400
-    if not title:
-        return jsonify({"error": "Missing title parameter"}), 400
+    # Calculate the visible area height (excluding the transition curve)
+    visible_area_height = dark_section_height - curve_height
     
-    try:
-        # Generate image using Runware API
-        try:
-            logger.info(f"Generating AI image with Runware API with prompt: {image_prompt}")
-            # Use the correct default size matching the generate_image definition
-            image_data = runware_client.generate_image(prompt=image_prompt, width=1024, height=1024)
-            logger.info("Runware AI image generation successful")
-        except Exception as e:
-            # If Runware fails, log the error and return it
-            logger.exception(f"Error generating AI image with Runware API: {str(e)}")
-            return jsonify({"error": f"Failed to generate image using Runware API: {str(e)}"}), 500
-        
-        # Process the image (reusing existing code from generate_from_prompt)
-        image_buffer = io.BytesIO(image_data)
-        img = Image.open(image_buffer)
-        
-        # Convert to RGB if needed
-        if img.mode != 'RGB':
-            img = img.convert('RGB')
-        
-        # Resize to Pinterest standard if needed
-        target_size = (1000, 1500)
-        if img.size != target_size:
-            img = img.resize(target_size, Image.LANCZOS)
-            
-        # Apply a subtle color enhancement
-        enhancer = ImageEnhance.Contrast(img)
-        img = enhancer.enhance(1.1)
-        enhancer = ImageEnhance.Color(img)
-        img = enhancer.enhance(1.15)
-        enhancer = ImageEnhance.Brightness(img)
-        img = enhancer.enhance(1.05)
-        
-        # Define font preferences early, before any potential usage
-        main_font_preferences = [
-            'PoetsenOne-Regular.ttf', 'LeagueSpartan-Bold.ttf', 'Montserrat-Bold.ttf',
-            'Lato-Bold.ttf', 'OpenSans-Bold.ttf', 'Poppins-Bold.ttf',
-            'arialbd.ttf', 'Arial-Bold.ttf'
-        ]
-        branding_font_preferences = [
-            'DejaVuSans-Light.ttf', 'Calibril.ttf', 'seguisli.ttf',
-            'LeagueSpartan-Light.ttf', 'Montserrat-Light.ttf', 'Lato-Light.ttf',
-            'OpenSans-Light.ttf', 'Poppins-Light.ttf', 'arial.ttf'
-        ]
-        
-        # Style 3 specific font preferences
-        style3_font_preferences = [
-            'Nunito-ExtraBold.ttf', 'Montserrat-ExtraBold.ttf', 'OpenSans-ExtraBold.ttf',
-            'Lato-Bold.ttf', 'Poppins-Bold.ttf'
-        ]
-        
-        # Style 4 specific font preferences
-        style4_font_preferences = [
-            'Vidaloka-Regular.ttf', 'Times New Roman Bold.ttf', 'Georgia Bold.ttf',
-            'PlayfairDisplay-Bold.ttf', 'Merriweather-Bold.ttf'
-        ]
-        
-        # Style 5 specific font preferences - using LeagueSpartan-Bold for title as specified
-        style5_font_preferences = [
-            'LeagueSpartan-Bold.ttf', 'Montserrat-Bold.ttf', 'OpenSans-Bold.ttf',
-            'Lato-Bold.ttf', 'Arial-Bold.ttf', 'arialbd.ttf'
-        ]
-        
-        # Base font size definition
-        base_font_size = 80
-        
-        # Define the text wrapping function early
-        def wrap_text(text, font_obj, max_w):
-            words = text.split()
-            lines = []
-            current_line = []
-            temp_draw = ImageDraw.Draw(Image.new('RGB', (1,1))) # Temp draw for textlength
-            for word in words:
-                test_line = ' '.join(current_line + [word])
-                test_width = temp_draw.textlength(test_line, font=font_obj)
-                if test_width <= max_w:
-                    current_line.append(word)
-                else:
-                    if current_line:
-                        lines.append(' '.join(current_line))
-                    current_line = [word]
+    # Calculate title position centered in visible area
+    # Add offset to account for curved part
+    curve_offset = 40  # Additional offset to move title down from curve
+    text_y = canvas_height - visible_area_height + ((visible_area_height - total_text_height) // 2) + curve_offset
+    
+    # Ensure title doesn't go too close to the bottom
+    min_bottom_margin = 120  # Minimum space from bottom for branding URL
+    if text_y + total_text_height > canvas_height - min_bottom_margin:
+        text_y = canvas_height - min_bottom_margin - total_text_height
+    return text_y
+
+def text_block_bounds(line_widths, line_advances, top, canvas_width):
+    """Returns the bounding box of horizontally centered lines stacked from top.
+
+    Args:
+        line_widths (list): The width of every line in pixels.
+        line_advances (list): The vertical advance of every line.
+        top (float): The y position of the first line.
+        canvas_width (int): The width of the image.
+
+    Returns:
+        tuple: (min_x, min_y, max_x, max_y) of the text block.
+    """
+    line_xs = [(canvas_width - line_width) // 2 for line_width in line_widths]
+    return (min(line_xs), top,
+            max(line_x + line_width for line_x, line_width in zip(line_xs, line_widths)),
+            sum(line_advances, top))
+
+def centered_line_x(line_width, canvas_width, side_margin=None):
+    """Returns the x position that centers a line, keeping it side_margin px from the edges.
+
+    Args:
+        line_width (float): The width of the line in pixels.
+        canvas_width (int): The width of the image.
+        side_margin (int): Minimum distance from the edges, or None to only center.
+
+    Returns:
+        float: The left x position of the line.
+    """
+    line_x = (canvas_width - line_width) // 2
+    # If text is too close to edges, adjust positioning
+    if side_margin is not None and line_x + line_width > canvas_width - side_margin:
+        line_x = max(side_margin, canvas_width - line_width - side_margin)
+    return line_x
+
+@functools.lru_cache(maxsize=128)
+def text_mask(text, font_obj, frac_x=0.0, frac_y=0.0, stroke_width=0, shadow_blur=0):
+    """Rasterizes text into a reusable L coverage mask.
+
+    Masks are cached per (text, font, sub-pixel offset), so re-rendering a title
+    (e.g. the same title on a new background) skips FreeType entirely. The
+    returned images are shared and must not be modified.
+
+    Args:
+        text (str): The text to rasterize.
+        font_obj (ImageFont): The font to rasterize with.
+        frac_x (float): Fractional part of the x position the text is drawn at.
+        frac_y (float): Fractional part of the y position the text is drawn at.
+        stroke_width (int): Border width to build a dilated mask for, or 0.
+        shadow_blur (int): GaussianBlur radius to build a soft shadow mask with, or 0.
+
+    Returns:
+        tuple: (mask, stroke_mask or None, shadow_mask, origin_x, origin_y), where
+        the origin is the whole-pixel position of the text's draw point inside the
+        masks. shadow_mask is the plain mask unless shadow_blur is set.
+    """
+    left, top, right, bottom = measure_text(text, font_obj)[1]
+    # Room for the dilated border and for the blur to fade out (~3 sigma)
+    pad = 2 + stroke_width + 3 * shadow_blur
+    # Whole-pixel origin inside the mask; it must stay positive so that the
+    # integer/fraction split of the position matches the one on the canvas
+    origin_x = pad - min(left, 0)
+    origin_y = pad - min(top, 0)
+    mask = Image.new('L', (origin_x + right + pad, origin_y + bottom + pad), 0)
+    ImageDraw.Draw(mask).text((origin_x + frac_x, origin_y + frac_y), text, fill=255, font=font_obj)
+    
+    stroke_mask = mask.filter(ImageFilter.MaxFilter(2 * stroke_width + 1)) if stroke_width else None
+    shadow_mask = mask.filter(ImageFilter.GaussianBlur(shadow_blur)) if shadow_blur else mask
+    return mask, stroke_mask, shadow_mask, origin_x, origin_y
+
+def draw_text_with_shadow(img, xy, text, font_obj, fill, shadow_layers, stroke_width=0, stroke_fill=None,
+                          shadow_blur=0):
+    """Draws text over its drop shadows, rasterizing the glyphs only once.
+
+    The glyphs come from a text_mask that keeps the fractional part of xy
+    (shadow offsets are whole pixels), and every layer is a solid-color paste
+    through that mask, which blends exactly like ImageDraw.text. A border is the
+    same mask dilated by stroke_width pixels (like drawing the text at every
+    neighbouring offset), so no extra rasterization is needed for it either.
+    A soft shadow is a single blurred copy of the mask instead of stacked layers.
+
+    Args:
+        img (Image): The image to draw on.
+        xy (tuple): The text position, as for ImageDraw.text.
+        text (str): The text to draw.
+        font_obj (ImageFont): The font to draw with.
+        fill (tuple): The text color.
+        shadow_layers (list): ((dx, dy), color) pairs, drawn in order beneath the text.
+        stroke_width (int): Width of an optional text border.
+        stroke_fill (tuple): Color of the border.
+        shadow_blur (int): GaussianBlur radius for the shadow layers, or 0 for hard shadows.
+    """
+    mask, stroke_mask, shadow_mask, origin_x, origin_y = text_mask(
+        text, font_obj, math.modf(xy[0])[0], math.modf(xy[1])[0], stroke_width, shadow_blur)
+    
+    mask_x = int(xy[0]) - origin_x
+    mask_y = int(xy[1]) - origin_y
+    for (offset_x, offset_y), color in shadow_layers:
+        img.paste(color, (mask_x + offset_x, mask_y + offset_y), shadow_mask)
+    
+    if stroke_mask is not None:
+        img.paste(stroke_fill, (mask_x, mask_y), stroke_mask)
+    img.paste(fill, (mask_x, mask_y), mask)
+
+def wrap_text(text, font_obj, max_w):
+    """Greedily wraps text into lines that fit within max_w pixels.
+
+    Args:
+        text (str): The text to wrap.
+        font_obj (ImageFont): The font used to measure the text.
+        max_w (int): The maximum line width in pixels.
+
+    Returns:
+        list: The wrapped lines.
+    """
+    words = text.split()
+    lines = []
+    current_line = []
+    current_width = 0
+    for word in words:
+        # Track the running pixel width so each word is measured once, instead of
+        # re-measuring the whole line (measured directly on the font, no draw context)
+        word_width = font_obj.getlength(' ' + word if current_line else word)
+        if current_width + word_width <= max_w:
+            current_line.append(word)
+            current_width += word_width
+        else:
             if current_line:
                 lines.append(' '.join(current_line))
-            return lines
-        
-        # Apply modern, low-contrast background effect 
-        bg_effect = img.copy()
-        enhancer = ImageEnhance.Contrast(bg_effect)
-        bg_effect = enhancer.enhance(0.85)
-        tint_overlay = Image.new('RGBA', target_size, (66, 66, 77, 25))
-        bg_effect = Image.alpha_composite(bg_effect.convert('RGBA'), tint_overlay)
-        gradient_overlay = Image.new('RGBA', target_size, (0, 0, 0, 0))
-        gradient_draw = ImageDraw.Draw(gradient_overlay)
-        for y in range(target_size[1]):
-            progress = y / target_size[1]
-            alpha = int(15 * progress) if progress < 0.5 else int(15 * (1 + (progress - 0.5)))
-            gradient_draw.line([(0, y), (target_size[0], y)], fill=(0, 0, 0, alpha))
-        bg_effect = Image.alpha_composite(bg_effect, gradient_overlay).convert('RGB')
-        img = bg_effect
-        
-        # Define helper function for rounded corners (used by multiple styles)
-        def add_rounded_corners(image, radius=40):
-            image = image.convert("RGBA")
-            mask = Image.new('L', image.size, 0)
-            mask_draw = ImageDraw.Draw(mask)
-            mask_draw.rounded_rectangle([(0, 0), image.size], radius=radius, fill=255)
-            result = Image.new('RGBA', image.size, (0, 0, 0, 0))
-            result.paste(image, (0, 0), mask)
-            return result
-        
-        # Additional background treatment for Style 2 to improve text readability
-        if style == 'style2':
-            # Convert to RGBA for overlay
-            img = img.convert('RGBA')
-            
-            # Create a semi-transparent overlay
-            overlay = Image.new('RGBA', target_size, (0, 0, 0, 0))
-            overlay_draw = ImageDraw.Draw(overlay)
-            
-            # Add a central area with more transparency for focal point
-            center_x, center_y = target_size[0] // 2, target_size[1] // 2
-            max_radius = max(target_size) * 0.7
-            
-            # Draw radial gradient overlay
-            for y in range(target_size[1]):
-                for x in range(target_size[0]):
-                    # Calculate distance from center (normalized)
-                    distance = ((x - center_x) ** 2 + (y - center_y) ** 2) ** 0.5 / max_radius
-                    distance = min(1.0, distance)  # Cap at 1.0
-                    
-                    # More opacity at edges (up to 100), less in center (min 40)
-                    opacity = int(40 + 60 * distance)
-                    overlay_draw.point((x, y), fill=(0, 0, 0, opacity))
-            
-            # Apply overlay to image
-            img = Image.alpha_composite(img, overlay).convert('RGB')
-            img = img.convert('RGBA')  # Convert back for further processing
-        
-        # Style 3 implementation - add black bars at top and bottom
-        elif style == 'style3':
-            # Convert to RGBA for adding bars
-            img = img.convert('RGBA')
-            
-            # First calculate text dimensions to determine appropriate top bar height
-            style3_font_scale = 1.0  # Reduced from 1.1 to ensure text fits better in the box
-            style3_font = load_bundled_font(style3_font_preferences, int(base_font_size * style3_font_scale))
-            temp_font = style3_font if style3_font else font
-            
-            # Calculate wrapped text height
-            temp_draw = ImageDraw.Draw(Image.new('RGB', (1,1)))
-            max_text_width = target_size[0] - 100  # Increased padding from 80 to 100 for better fit
-            
-            # Wrap text for measurement
-            temp_wrapped_lines = wrap_text(title, temp_font, max_text_width)
-            
-            # Calculate total text height
-            line_heights_temp = []
-            for line in temp_wrapped_lines:
-                try:
-                    bbox = temp_draw.textbbox((0,0), line, font=temp_font)
-                    line_heights_temp.append(bbox[3] - bbox[1])
-                except:
-                    # Fallback if textbbox not available
-                    line_heights_temp.append(base_font_size * style3_font_scale)
-            
-            # Calculate total height with spacing
-            total_text_height = sum(h * 1.2 for h in line_heights_temp)
-            
-            # Define dimensions for the black bars - dynamic top bar
-            top_padding = 50  # Padding above and below text
-            top_bar_height = int(total_text_height + (top_padding * 2))  # Adjust based on text
-            top_bar_height = max(170, min(320, top_bar_height))  # Min/max bounds for aesthetics
-            bottom_bar_height = 180  # Bar at bottom for branding
-            
-            # Create new image with space for bars
-            new_img = Image.new('RGBA', target_size, (0, 0, 0, 0))
-            
-            # Create black bars with slight transparency for elegance
-            top_bar_color = (33, 33, 35, 240)  # #212123 with transparency
-            top_bar = Image.new('RGBA', (target_size[0], top_bar_height), top_bar_color)
-            bottom_bar = Image.new('RGBA', (target_size[0], bottom_bar_height), top_bar_color)  # Use same color for bottom bar
-            
-            # Paste the main image first
-            new_img.paste(img, (0, 0))
-            
-            # Then overlay the bars
-            new_img.paste(top_bar, (0, 0), top_bar)
-            new_img.paste(bottom_bar, (0, target_size[1] - bottom_bar_height), bottom_bar)
-            
-            # Update img and draw for further processing
-            img = new_img
-            
-        # Style 4 implementation - Image at top, dark rectangle at bottom with title and branding
-        elif style == 'style4':
-            # Convert to RGBA for adding elements
-            img = img.convert('RGBA')
-            
-            # Define dimensions for bottom rectangle
-            bottom_rect_height = 450  # Bottom dark rectangle height
-            
-            # Create new image for composition
-            new_img = Image.new('RGBA', target_size, (0, 0, 0, 0))
-            
-            # Create bottom dark rectangle with slight transparency
-            bottom_rect_color = (30, 30, 30, 245)  # Dark gray/black with transparency
-            bottom_rect = Image.new('RGBA', (target_size[0], bottom_rect_height), bottom_rect_color)
-            
-            # Paste the main image first
-            new_img.paste(img, (0, 0))
-            
-            # Then overlay the bottom rectangle
-            new_img.paste(bottom_rect, (0, target_size[1] - bottom_rect_height), bottom_rect)
-            
-            # Update img for further processing
-            img = new_img
-            
-        # Style 5 implementation - Image at top with curved dark shape at bottom
-        elif style == 'style5':
-            # Convert to RGBA for adding elements
-            img = img.convert('RGBA')
-            
-            # Define dimensions for the curved dark shape
-            dark_section_height = 1300  # Height of the dark section from bottom
-            image_visible_height = target_size[1] - dark_section_height  # How much of the image will be visible
-            
-            # Parabola parameters (matching the example)
-            peak_height_ratio = 0.6  # Height of peak as fraction of dark section height
-            steepness_factor = 0.3   # How quickly curve drops off from center
-            
-            # Create a new image for composition
-            new_img = Image.new('RGBA', target_size, (0, 0, 0, 0))
-            
-            # Position the image so its center is at the top portion
-            # First calculate the offset needed to move the image up
-            # For 1:1 original image that's 1024x1024, we need to offset to show the center
-            img_width, img_height = img.size
-            
-            # Calculate vertical offset to position the image lower to hide the bottom portion
-            # Using a negative offset to descend (move down) the image
-            # This will hide more of the image behind the dark curved area
-            y_offset = -150  # Negative value moves the image down
-            
-            # Create a mask for the curved shape
-            mask = Image.new('L', target_size, 0)
-            mask_draw = ImageDraw.Draw(mask)
-            
-            # Calculate curve positions
-            curve_start_y = target_size[1] - dark_section_height
-            peak_y = dark_section_height * peak_height_ratio
-            center_x = target_size[0] / 2
-            
-            # Calculate parabola scaling factor
-            a = (steepness_factor * peak_y) / (center_x**2)
-            
-            # First fill the entire bottom section (below where curve would end)
-            mask_draw.rectangle([(0, curve_start_y + peak_y), (target_size[0], target_size[1])], fill=255)
-            
-            # Generate points for the parabolic curve
-            curve_points = []
-            # Add bottom-left corner first
-            curve_points.append((0, target_size[1]))
-            
-            # Calculate and add all curve points
-            num_points = 100  # Number of points to generate along curve
-            for i in range(num_points + 1):
-                x = i * target_size[0] / num_points
-                # Calculate parabola: y = -a * (x - center_x)^2 + peak_y + curve_start_y
-                y = -a * (x - center_x)**2 + peak_y + curve_start_y
-                curve_points.append((x, y))
-            
-            # Add bottom-right corner
-            curve_points.append((target_size[0], target_size[1]))
-            
-            # Draw the filled polygon
-            mask_draw.polygon(curve_points, fill=255)
-            
-            # Create the dark section overlay with the mask
-            dark_section = Image.new('RGBA', target_size, (30, 30, 35, 245))  # Dark gray/black
-            dark_section.putalpha(mask)
-            
-            # Paste the main image with the calculated offset to center it in the top portion
-            new_img.paste(img, (0, y_offset))
-            
-            # Then overlay the dark section using the mask
-            new_img = Image.alpha_composite(new_img, dark_section)
-            
-            # Update img for further processing
-            img = new_img
-        
-        # Prepare for text overlay
-        draw = ImageDraw.Draw(img) # Initial draw object on base image
-        
-        # --- Font Loading ---
-        branding_font_size = 60 # Note: subtitle font seems unused currently
+            current_line = [word]
+            current_width = font_obj.getlength(word)
+    if current_line:
+        lines.append(' '.join(current_line))
+    return lines
 
-        logger.info("Loading main font...")
-        font = load_bundled_font(main_font_preferences, base_font_size)
+def fit_font_size(text, font_names, max_w, max_lines=6, max_size=BASE_TITLE_FONT_SIZE,
+                  min_size=MIN_TITLE_FONT_SIZE, step=TITLE_FONT_SIZE_STEP):
+    """Finds the largest font size that wraps the text into at most max_lines.
 
-        # --- Auto-scale font size / Text wrapping ---
-        max_width = target_size[0] - 120 # Max width for title text
-        
-        # For style 2, increase the text padding from edges
-        if style == 'style2':
-            # Use more padding to keep text further from edges
-            max_width = target_size[0] - 160
-        
-        # Initial wrap
-        wrapped_lines = wrap_text(title, font, max_width)
-        
-        # Dynamically adjust font size
-        while len(wrapped_lines) > 6 and base_font_size > 30:
-            base_font_size -= 5
-            logger.info(f"Text too long, reducing main font size to {base_font_size}")
-            font = load_bundled_font(main_font_preferences, base_font_size) # Reload font
-            wrapped_lines = wrap_text(title, font, max_width)
-            
-        # Calculate text height and position
-        line_heights = [draw.textbbox((0,0), line, font=font)[3] - draw.textbbox((0,0), line, font=font)[1] for line in wrapped_lines]
-        line_spacing_factor = 1.3
-        total_text_height = sum(lh * line_spacing_factor for lh in line_heights) - (line_heights[0] * (line_spacing_factor - 1.2)) # Adjust first line spacing
-        available_height = target_size[1]
-        
-        # Adjust text position based on style
-        if style == 'style2':
-            # For Style 2, position text at the top of the image with proper padding
-            text_y = 80  # Fixed position from top with good padding
-            
-            # Check if text might be too close to bottom elements
-            if text_y + total_text_height > available_height - 200:
-                # If text is very long and would overlap with bottom elements, adjust as needed
-                text_y = max(40, available_height - 200 - total_text_height)
-        elif style == 'style3':
-            # For Style 3, position text in the top black bar, centered vertically
-            # We need to reference the top_bar_height calculated earlier
-            text_y = (top_bar_height - total_text_height) // 2  # Center text vertically in top bar
-            # Ensure perfect centering by adjusting for any rounding errors
-            text_y = max(20, text_y)  # Ensure minimum padding from top, but allow more centering
-        elif style == 'style4':
-            # For Style 4, position text in the bottom rectangle
-            # Position based on available space within the bottom rectangle
-            bottom_rect_height = 450  # Must match the value defined earlier
-            
-            # Define font scale for style 4
-            style4_font_scale = 1.1  # Same scale used in the text drawing section
-            
-            # Calculate available space, reserving room for branding URL box
-            branding_box_height = 100  # Estimated height including padding
-            branding_box_margin = 50   # Space between title and branding box
-            
-            # Calculate available height for the title text
-            available_title_height = bottom_rect_height - branding_box_height - branding_box_margin
-            
-            # If title is very long, adjust font size
-            if len(wrapped_lines) > 3 or len(title) > 50:
-                # More aggressive font size reduction for long titles
-                # Base reduction on both line count and total character length
-                line_factor = max(0, len(wrapped_lines) - 3) 
-                length_factor = max(0, len(title) - 50) // 10  # Every 10 chars over 50
-                
-                # Combined reduction factor (larger of the two plus half of the smaller)
-                if line_factor > length_factor:
-                    font_reduction = line_factor * 8 + (length_factor * 4)
-                else:
-                    font_reduction = length_factor * 8 + (line_factor * 4)
-                
-                # Cap the reduction to avoid too small text
-                font_reduction = min(30, font_reduction)  # Maximum 30px reduction
-                
-                # Apply reduction and reload font
-                original_font_size = int(base_font_size * style4_font_scale)
-                new_font_size = max(40, original_font_size - font_reduction)  # Ensure minimum 40px size
-                
-                logger.info(f"Reducing Style 4 title font from {original_font_size}px to {new_font_size}px (reduction: {font_reduction}px)")
-                
-                style4_font = load_bundled_font(style4_font_preferences, new_font_size)
-                font = style4_font if style4_font else font
-                
-                # Rewrap text with the new font size
-                max_width = target_size[0] - 120
-                wrapped_lines = wrap_text(title, font, max_width)
-                
-                # Recalculate line heights with new font
-                line_heights = [draw.textbbox((0,0), line, font=font)[3] - draw.textbbox((0,0), line, font=font)[1] for line in wrapped_lines]
-                
-                # Use tighter line spacing for reduced font sizes
-                if font_reduction > 15:
-                    line_spacing_factor = 1.1  # Very tight spacing for heavily reduced fonts
-                else:
-                    line_spacing_factor = 1.2  # Somewhat reduced spacing
-            else:
-                line_spacing_factor = 1.3  # Normal spacing for shorter titles
-            
-            # Recalculate total text height with possibly updated line heights and spacing
-            total_text_height = sum(lh * line_spacing_factor for lh in line_heights) - (line_heights[0] * (line_spacing_factor - 1.2))
-            
-            # Top position - keep title in upper portion of the dark rectangle with padding
-            top_padding_in_rect = 40  # Padding from top of dark rectangle
-            text_y = target_size[1] - bottom_rect_height + top_padding_in_rect
-            
-            # Make sure title doesn't extend into area reserved for branding URL
-            max_title_bottom = target_size[1] - branding_box_height - branding_box_margin
-            
-            # If title would overflow into branding area, adjust position upward
-            if text_y + total_text_height > max_title_bottom:
-                text_y = max_title_bottom - total_text_height
-                # Ensure minimum padding from top
-                text_y = max(target_size[1] - bottom_rect_height + 20, text_y)
-            
-            logger.debug(f"Style 4: Title height={total_text_height}, position y={text_y}, max bottom={max_title_bottom}")
-        elif style == 'style5':
-            # For Style 5, position title in the curved dark section
-            # We want to center it vertically in the dark section, adjusting for the curve
-            dark_section_height = 550  # Must match the value from the style5 implementation
-            curve_height = 100  # Must match the value from the style5 implementation
-            
-            # Calculate the visible area height (excluding the transition curve)
-            visible_area_height = dark_section_height - curve_height
-            
-            # Calculate title position centered in visible area
-            # Add offset to account for curved part
-            curve_offset = 40  # Additional offset to move title down from curve
-            text_y = target_size[1] - visible_area_height + ((visible_area_height - total_text_height) // 2) + curve_offset
-            
-            # Ensure title doesn't go too close to the bottom
-            min_bottom_margin = 120  # Minimum space from bottom for branding URL
-            if text_y + total_text_height > target_size[1] - min_bottom_margin:
-                text_y = target_size[1] - min_bottom_margin - total_text_height
-        else: # Style 1
-            # Style 1 positioning - also moved to top
-            text_y = 80  # Fixed position from top with good padding (same as Style 2)
-            
-            # Check if text might be too close to bottom elements
-            if text_y + total_text_height > available_height - 200:
-                # If text is very long and would overlap with bottom elements, adjust as needed
-                text_y = max(40, available_height - 200 - total_text_height)
-
-        # --- Text Background Box (Only for Style 1) ---
-        if style == 'style1':
-            padding = 35
-            corner_radius = 25
-            bg_color = (0, 0, 0, 180)  # Increased opacity to match example
-            shadow_color_box = (0, 0, 0, 70)
-            shadow_offset_box = (5, 5)
-
-            # Calculate text block bounding box
-            max_line_width = 0
-            _current_y_bbox = text_y # Use a temp var for bbox calculation y
-            text_block_bbox = [target_size[0], target_size[1], 0, 0] # [min_x, min_y, max_x, max_y]
-            for i, line in enumerate(wrapped_lines):
-                line_width = draw.textlength(line, font=font)
-                max_line_width = max(max_line_width, line_width)
-                line_x = (target_size[0] - line_width) // 2
-                actual_line_height = line_heights[i] * (line_spacing_factor if i > 0 else 1.2)
-                text_block_bbox[0] = min(text_block_bbox[0], line_x)
-                text_block_bbox[1] = min(text_block_bbox[1], _current_y_bbox)
-                text_block_bbox[2] = max(text_block_bbox[2], line_x + line_width)
-                text_block_bbox[3] = max(text_block_bbox[3], _current_y_bbox + actual_line_height)
-                _current_y_bbox += actual_line_height
-
-            # Make the box wider to match example
-            box_padding_sides = 50
-            
-            # Calculate box dimensions
-            box_left = int(text_block_bbox[0] - box_padding_sides)
-            box_top = int(text_block_bbox[1] - padding)
-            box_right = int(text_block_bbox[2] + box_padding_sides)
-            box_bottom = int(text_block_bbox[3] + padding * 0.8)
-            box_width = box_right - box_left
-            box_height = box_bottom - box_top
-
-            # Ensure box is within bounds
-            box_left = max(0, box_left)
-            box_top = max(0, box_top)
-            box_right = min(target_size[0], box_right)
-            box_bottom = min(target_size[1], box_bottom)
-            box_width = box_right - box_left
-            box_height = box_bottom - box_top
-
-            if box_width > 0 and box_height > 0:
-                # Draw box on a separate surface and composite
-                box_surface = Image.new('RGBA', img.size, (0,0,0,0))
-                box_draw = ImageDraw.Draw(box_surface)
-                # Shadow
-                shadow_rect = [(box_left + shadow_offset_box[0], box_top + shadow_offset_box[1]),
-                               (box_right + shadow_offset_box[0], box_bottom + shadow_offset_box[1])]
-                box_draw.rounded_rectangle(shadow_rect, radius=corner_radius, fill=shadow_color_box)
-                # Main box
-                main_rect = [(box_left, box_top), (box_right, box_bottom)]
-                box_draw.rounded_rectangle(main_rect, radius=corner_radius, fill=bg_color)
-                # Composite
-                img = Image.alpha_composite(img.convert('RGBA'), box_surface) # Keep as RGBA for now
-                draw = ImageDraw.Draw(img) # Re-assign draw object to the updated image
-
-        # --- Text Drawing ---
-        current_y = text_y # Reset Y position for drawing
-        for i, line in enumerate(wrapped_lines):
-            line_width = draw.textlength(line, font=font)
-            line_x = (target_size[0] - line_width) // 2
-            actual_line_height = line_heights[i] * (line_spacing_factor if i > 0 else 1.2)
-            # --- Start Replace ---  (Replace old Style 1 logic)
-            if style == 'style2':
-                # Style 2: Golden text with enhanced shadow for readability
-                # Make title larger for Style 2 but ensure it stays within boundaries
-                style2_font_scale = 1.0 # Increased from 0.9 for larger text
-                
-                # Use EBGaramond-Bold.ttf specifically for Style 2
-                style2_font = load_bundled_font(['EBGaramond-Bold.ttf'], int(base_font_size * style2_font_scale))
-                # Use the specific font if successfully loaded, otherwise fallback to original font
-                current_font = style2_font if style2_font else font
-                
-                # Ensure perfect centering for each line
-                line_width = draw.textlength(line, font=current_font)
-                adjusted_line_x = (target_size[0] - line_width) // 2
-                
-                # If text is too close to edges, adjust positioning
-                if adjusted_line_x + line_width > target_size[0] - 40:  # 40px right margin
-                    adjusted_line_x = max(40, target_size[0] - line_width - 40)  # Ensure minimum 40px from left
-                
-                # Change text color to golden (#d7bd45)
-                style2_text_color = (215, 189, 69)  # #d7bd45 converted to RGB
-                style2_shadow_color = (0, 0, 0, 150) # Darker shadow for better visibility (increased from 100)
-                style2_shadow_offset = (4, 4) # Increased shadow offset for more depth (was 3,3)
-                style2_stroke_color = (0, 0, 0, 255) # Black border
-                
-                # Enhanced shadow effect - multiple layers with decreasing opacity
-                shadow_layers = [
-                    ((5, 5), (0, 0, 0, 120)),  # Furthest shadow layer
-                    ((4, 4), (0, 0, 0, 130)),  # Middle shadow layer
-                    ((3, 3), (0, 0, 0, 150))   # Closest shadow layer
-                ]
-                
-                # Draw multiple shadow layers for depth
-                for offset, color in shadow_layers:
-                    draw.text((adjusted_line_x + offset[0], current_y + offset[1]), 
-                              line, fill=color, font=current_font)
-                
-                # Draw black border effect by drawing the text multiple times with slight offsets
-                for offset_x, offset_y in [(0, 1), (1, 0), (0, -1), (-1, 0), (1, 1), (-1, -1), (1, -1), (-1, 1)]:
-                    draw.text((adjusted_line_x + offset_x, current_y + offset_y), 
-                            line, fill=style2_stroke_color, font=current_font)
-                
-                # Draw main text on top
-                draw.text((adjusted_line_x, current_y), line, fill=style2_text_color, font=current_font)
-            elif style == 'style3':
-                # Style 3 - use white text on black bars with Nunito or similar font
-                style3_font_scale = 1.0  # Reduced from 1.1 for better fit
-                style3_font = load_bundled_font(style3_font_preferences, int(base_font_size * style3_font_scale))
-                # Use the specific font if successfully loaded, otherwise fallback to original font
-                current_font = style3_font if style3_font else font
-                
-                # Ensure perfect centering for each line
-                line_width = draw.textlength(line, font=current_font)
-                adjusted_line_x = (target_size[0] - line_width) // 2
-                
-                # Ensure minimum margins
-                if adjusted_line_x + line_width > target_size[0] - 50:  # Increased from 40 to 50
-                    adjusted_line_x = max(50, target_size[0] - line_width - 50)  # Ensure minimum 50px from sides
-                
-                # Pure white text for high contrast against black bar
-                style3_text_color = (255, 255, 255)
-                
-                # Draw text with subtle shadow for depth
-                shadow_offset = (2, 2)
-                shadow_color = (0, 0, 0, 100)
-                
-                # Shadow for subtle depth
-                draw.text((adjusted_line_x + shadow_offset[0], current_y + shadow_offset[1]),
-                          line, fill=shadow_color, font=current_font)
-                
-                # Main text
-                draw.text((adjusted_line_x, current_y), line, fill=style3_text_color, font=current_font)
-            elif style == 'style4':
-                # Style 4: Gold-colored text in the bottom rectangle using Vidaloka font
-                style4_font_scale = 1.1  # Scale up font size for Style 4 title
-                
-                # Load Vidaloka font for Style 4
-                style4_font = load_bundled_font(style4_font_preferences, int(base_font_size * style4_font_scale))
-                # Use the specific font if successfully loaded, otherwise fallback to original font
-                current_font = style4_font if style4_font else font
-                
-                # Ensure perfect centering for each line
-                line_width = draw.textlength(line, font=current_font)
-                adjusted_line_x = (target_size[0] - line_width) // 2
-                
-                # If text is too close to edges, adjust positioning
-                if adjusted_line_x + line_width > target_size[0] - 40:  # 40px right margin
-                    adjusted_line_x = max(40, target_size[0] - line_width - 40)  # Ensure minimum 40px from left
-                
-                # Use the specified gold color (#d7bd45)
-                style4_text_color = (215, 189, 69)  # #d7bd45 converted to RGB
-                
-                # First draw a subtle shadow for depth against dark background
-                shadow_offset = (2, 2)
-                shadow_color = (0, 0, 0, 150)
-                draw.text((adjusted_line_x + shadow_offset[0], current_y + shadow_offset[1]),
-                          line, fill=shadow_color, font=current_font)
-                
-                # Main gold text
-                draw.text((adjusted_line_x, current_y), line, fill=style4_text_color, font=current_font)
-            elif style == 'style5':
-                # Style 5: White bold text in the dark curved section using LeagueSpartan-Bold font
-                style5_font_scale = 1.2  # Scale up font size for more impact
-                
-                # Load LeagueSpartan-Bold font for Style 5
-                style5_font = load_bundled_font(style5_font_preferences, int(base_font_size * style5_font_scale))
-                # Use the specific font if successfully loaded, otherwise fallback to original font
-                current_font = style5_font if style5_font else font
-                
-                # Ensure perfect centering for each line
-                line_width = draw.textlength(line, font=current_font)
-                adjusted_line_x = (target_size[0] - line_width) // 2
-                
-                # If text is too close to edges, adjust positioning
-                if adjusted_line_x + line_width > target_size[0] - 40:  # 40px right margin
-                    adjusted_line_x = max(40, target_size[0] - line_width - 40)  # Ensure minimum 40px from left
-                
-                # Bright white text for high contrast against dark background
-                style5_text_color = (255, 255, 255)  # Pure white
-                
-                # Add subtle shadow for depth
-                shadow_offset = (3, 3)
-                shadow_color = (0, 0, 0, 130)
-                draw.text((adjusted_line_x + shadow_offset[0], current_y + shadow_offset[1]),
-                          line, fill=shadow_color, font=current_font)
-                
-                # Main white text
-                draw.text((adjusted_line_x, current_y), line, fill=style5_text_color, font=current_font)
-            else: # Style 1
-                # Style 1: Gold text with shadow to match example
-                # Use a slightly different font preference for Style 1
-                style1_font_scale = 1.05  # Slightly larger font
-                style1_font = load_bundled_font(['LeagueSpartan-Bold.ttf', 'Montserrat-Bold.ttf'], 
-                                               int(base_font_size * style1_font_scale))
-                # Use the specific font if successfully loaded, otherwise fallback to original font
-                current_font = style1_font if style1_font else font
-                
-                # Ensure perfect centering for each line
-                line_width = draw.textlength(line, font=current_font)
-                adjusted_line_x = (target_size[0] - line_width) // 2
-                
-                # Gold color like in the example
-                style1_text_color = (215, 189, 69)  # Gold color (#d7bd45)
-                shadow_offset = (3, 3)
-                shadow_color = (0, 0, 0, 150)
-                
-                # Shadow
-                draw.text((adjusted_line_x + shadow_offset[0], current_y + shadow_offset[1]),
-                          line, fill=shadow_color, font=current_font)
-                # Main text
-                draw.text((adjusted_line_x, current_y), line, fill=style1_text_color, font=current_font)
-            # --- End Replace ---
-
-            # !!! IMPORTANT: Re-insert the missing Y increment here !!!
-            current_y += actual_line_height
-
-        # --- Create dark bottom bar for Style 1 before any other elements ---
-        if style == 'style1' and branding_url:
-            # Define dark bar at bottom for branding URL
-            bottom_bar_height = 60  # Height of bottom bar
-            bottom_bar_color = (0, 0, 0, 200)  # Semi-transparent black, darker than before
-            
-            # Create the box
-            bottom_bar = Image.new('RGBA', (target_size[0], bottom_bar_height), bottom_bar_color)
-            
-            # Overlay the bar at the bottom of the image
-            img.paste(bottom_bar, (0, target_size[1] - bottom_bar_height), bottom_bar)
-            
-            # Update drawing context
-            draw = ImageDraw.Draw(img)
-
-        # --- Create dark bottom bar for Style 2 as well ---
-        if style == 'style2' and branding_url:
-            # Define dark bar at bottom for branding URL
-            bottom_bar_height = 60  # Height of bottom bar
-            bottom_bar_color = (0, 0, 0, 200)  # Semi-transparent black
-            
-            # Create the box
-            bottom_bar = Image.new('RGBA', (target_size[0], bottom_bar_height), bottom_bar_color)
-            
-            # Overlay the bar at the bottom of the image
-            img.paste(bottom_bar, (0, target_size[1] - bottom_bar_height), bottom_bar)
-            
-            # Update drawing context
-            draw = ImageDraw.Draw(img)
+    Candidate sizes run from max_size down to min_size in `step` decrements and
+    are binary-searched, so only a handful of sizes are loaded and wrapped.
 
-        # --- Draw Branding URL (Re-added from previous version) --- 
-        if branding_url:
-             logger.info(f"Drawing branding URL: {branding_url}")
-             # Use the `current_y` value which marks the position *after* the last title line was drawn
-             title_bottom_y = current_y 
-             logger.debug(f"Position after last title line (current_y) = {title_bottom_y}")
-
-             try:
-                  # Skip drawing for Style 4 if already handled in final touches
-                  if style == 'style4' and 'style4_branding_done' in locals() and style4_branding_done:
-                      logger.info("Skipping regular branding URL draw for Style 4 - already handled in golden box")
-                      pass
-                  elif style == 'style5' and 'style5_branding_done' in locals() and style5_branding_done:
-                      logger.info("Skipping regular branding URL draw for Style 5 - already handled in white box")
-                      pass
-                  else:
-                      # Define branding font and size
-                      branding_font_size = 30  # Default size for branding
-                      
-                      if style == "style1":
-                          # Use the same font as the title and adjust size to fit in the bottom box
-                          branding_font_size = 36  # Reduced from 40 to fit better in the bottom box
-                          branding_font_preferences = ['LeagueSpartan-Bold.ttf', 'Montserrat-Bold.ttf']
-                      elif style == "style2":
-                          # Increase font size for Style 2 branding URL but ensure it fits well
-                          branding_font_size = 38  # Adjusted from 45 to fit better
-                          branding_font_preferences = ['EBGaramond-Bold.ttf', 'LeagueSpartan-Bold.ttf', 'Montserrat-Bold.ttf']
-                      
-                      branding_font = load_bundled_font(branding_font_preferences, branding_font_size)
-                      if not branding_font:
-                           logger.warning("Branding font failed to load, using default.")
-                           # Use Pillow default with size if possible
-                           try:
-                               branding_font = ImageFont.load_default(size=branding_font_size)
-                           except TypeError:
-                               branding_font = ImageFont.load_default() # Older Pillow
-                           
-                      # Calculate text width
-                      try:
-                          branding_width = draw.textlength(branding_url, font=branding_font)
-                      except AttributeError:
-                          branding_width = draw.textsize(branding_url, font=branding_font)[0]
-                          
-                      # Get text height
-                      try:
-                           bbox = draw.textbbox((0,0), branding_url, font=branding_font)
-                           text_height = bbox[3] - bbox[1]
-                      except AttributeError:
-                           text_height = branding_font_size # Fallback height
-
-                      # Center text horizontally
-                      branding_x = (target_size[0] - branding_width) // 2
-                      
-                      # Position branding text based on style
-                      if style == 'style4':
-                          # For Style 4, position below the title text with spacing
-                          padding_below_title = 50  # Increased padding below title for Style 4
-                          
-                          # Use golden box for branding URL instead of directly drawing text
-                          # Set font to a more appropriate one for a box display
-                          style4_branding_font_size = 40  # Good size for visibility in the box
-                          style4_branding_font_preferences = style4_font_preferences  # Use same font preferences as title
-                          style4_branding_font = load_bundled_font(style4_branding_font_preferences, style4_branding_font_size)
-                          
-                          try:
-                              # Make sure we have a draw object for the current image state
-                              draw = ImageDraw.Draw(img)
-                              
-                              # Calculate dimensions
-                              style4_branding_width = draw.textlength(branding_url, font=style4_branding_font)
-                              style4_bbox = draw.textbbox((0,0), branding_url, font=style4_branding_font)
-                              style4_text_height = style4_bbox[3] - style4_bbox[1]
-                              
-                              # Define golden box dimensions with padding
-                              box_padding_x = 60  # Horizontal padding (30px on each side)
-                              box_padding_y = 20  # Vertical padding (10px on top and bottom)
-                              box_width = style4_branding_width + box_padding_x
-                              box_height = style4_text_height + box_padding_y
-                              
-                              # Center box horizontally
-                              box_x = (target_size[0] - box_width) // 2
-                              
-                              # Position at bottom of image with more padding from title
-                              box_bottom_padding = 30  # Reduced padding from bottom to move box lower
-                              box_y = target_size[1] - box_bottom_padding - box_height
-                              
-                              # Golden color for the box (like in the image)
-                              gold_color = (230, 190, 60, 255)  # Bright gold color
-                              
-                              # Draw the box with slight rounding
-                              box_rect = [(box_x, box_y), (box_x + box_width, box_y + box_height)]
-                              draw.rounded_rectangle(box_rect, radius=5, fill=gold_color)
-                              
-                              # Calculate text position using bounding box for accurate centering
-                              box_center_x = box_x + (box_width / 2)
-                              box_center_y = box_y + (box_height / 2)
-                              
-                              # Calculate text position using bounding box for accurate centering
-                              style4_branding_x = int(box_center_x - (style4_branding_width / 2))
-                              
-                              # Adjust Y position based on bounding box for more accurate centering
-                              # This helps account for the text baseline which can make text appear off-center
-                              # First determine the text's baseline offset
-                              ascent = style4_text_height * 0.75  # Approximate ascent for most fonts
-                              
-                              # Position text with baseline correction to center it vertically
-                              style4_branding_y = int(box_center_y - (style4_text_height / 2))
-                              
-                              # Apply additional vertical adjustment to fix centering if needed
-                              vertical_adjustment = -5  # Adjust if text still appears too low
-                              style4_branding_y += vertical_adjustment
-                              
-                              logger.info(f"Box: x={box_x}, y={box_y}, w={box_width}, h={box_height}")
-                              logger.info(f"Box center: ({box_center_x}, {box_center_y})")
-                              logger.info(f"Text dimensions: w={style4_branding_width}, h={style4_text_height}")
-                              logger.info(f"Adjusted text pos: ({style4_branding_x}, {style4_branding_y})")
-                              
-                              # Draw text in black with precise positioning
-                              draw.text((style4_branding_x, style4_branding_y), 
-                                      branding_url, fill=(0, 0, 0, 255), font=style4_branding_font)
-                              
-                              # This approach bypasses the regular branding URL drawing code
-                              # Set a flag to prevent double-drawing
-                              style4_branding_done = True
-                              
-                          except Exception as e:
-                              logger.error(f"Error drawing Style 4 golden branding box: {e}")
-                              style4_branding_done = False
-                      elif style == 'style3':
-                          # For Style 3, position above the bottom black box (not inside it)
-                          bottom_bar_height = 180  # Must match the value from style3 implementation
-                          bottom_bar_top = target_size[1] - bottom_bar_height
-                          
-                          # Position button above the black box with some padding
-                          padding_above_box = 30  # Space between button and top of black box
-                          button_y = bottom_bar_top - button_height - padding_above_box
-                          
-                          # Use same font as title for branding URL
-                          branding_font_size = 50  # Increased size for better visibility
-                          branding_font_preferences = style3_font_preferences  # Use the same font preferences as the title
-                          branding_font = load_bundled_font(branding_font_preferences, branding_font_size)
-                          
-                          # Reset branding_x for Style 3 since it might be overwritten
-                          branding_x = None
-                          
-                          # Recalculate text dimensions with the new font
-                          try:
-                              branding_width = draw.textlength(branding_url, font=branding_font)
-                              bbox = draw.textbbox((0,0), branding_url, font=branding_font)
-                              text_height = bbox[3] - bbox[1]
-                              
-                              # Center text in the bottom bar both horizontally and vertically
-                              branding_x = (target_size[0] - branding_width) // 2
-                              # Calculate vertical center of the bottom bar
-                              bottom_bar_center_y = bottom_bar_top + (bottom_bar_height // 2)
-                              # Position text centered vertically in the bar
-                              branding_y = bottom_bar_center_y - (text_height // 2)
-                              
-                              logger.info(f"Style 3 branding URL will be drawn at x={branding_x}, y={branding_y}")
-                          except:
-                              logger.warning("Could not recalculate branding text dimensions")
-                              # Fallback positioning if calculation fails
-                              branding_x = (target_size[0] // 2)  # Center horizontally
-                              padding_from_bottom = 40
-                              branding_y = target_size[1] - padding_from_bottom - text_height
-                          
-                          # Use white text color to match the title
-                          branding_text_color = (255, 255, 255, 255)  # Full opacity white for better visibility
-                      elif style == 'style5':
-                          # For Style 5, position near the bottom of the curved dark section
-                          padding_from_bottom = 50  # Padding from bottom of the image
-                          branding_y = target_size[1] - padding_from_bottom - text_height
-                          
-                          # Use white text to match the title, slightly transparent
-                          branding_text_color = (255, 255, 255, 220)
-                      elif style == 'style2':
-                          # For Style 2, position in the bottom dark bar (similar to Style 1)
-                          bottom_bar_height = 60  # Must match the bottom bar height defined earlier
-                          padding_from_bottom = 12  # Adjusted from 15 to center better in the bar
-                          branding_y = target_size[1] - (bottom_bar_height / 2) - (text_height / 2)
-                          
-                          # Use light gold or white text for better contrast against the dark background
-                          branding_text_color = (255, 240, 180, 255)  # Light gold color
-                      elif style == 'style1':
-                          # For Style 1, position in the bottom dark bar
-                          bottom_bar_height = 60  # Must match the bottom bar height defined earlier
-                          padding_from_bottom = 12  # Adjusted from 15 to center better in the bar
-                          branding_y = target_size[1] - (bottom_bar_height / 2) - (text_height / 2)
-                          
-                          # Use gold text color to match the title
-                          branding_text_color = (215, 189, 69, 255)  # Gold color (#d7bd45)
-                      else:
-                          # Default positioning from bottom for other styles (fallback)
-                          padding_bottom = 30
-                          branding_y = target_size[1] - text_height - padding_bottom
-                          branding_text_color = (200, 200, 200)  # Light gray for other styles
-                      
-                      logger.debug(f"Branding text width={branding_width}, height={text_height}")
-                      logger.debug(f"Drawing branding at x={branding_x}, y={branding_y}")
-                      
-                      # Define shadow effects based on style
-                      if style == 'style1' or style == 'style2':
-                          # Stronger shadow for styles 1 and 2 that might need more contrast
-                          # Multi-layer shadow for better visibility in these styles
-                          shadow_layers = [
-                              ((3, 3), (0, 0, 0, 100)),
-                              ((2, 2), (0, 0, 0, 130)),
-                              ((1, 1), (0, 0, 0, 150))
-                          ]
-                          
-                          for offset, color in shadow_layers:
-                              draw.text((branding_x + offset[0], branding_y + offset[1]), 
-                                      branding_url, fill=color, font=branding_font)
-                      else:
-                          # Default shadow for other styles
-                          branding_shadow_color = (0, 0, 0, 100)
-                          branding_shadow_offset = (2, 2)  # Increased from (1,1) for better visibility
-                          draw.text((branding_x + branding_shadow_offset[0], branding_y + branding_shadow_offset[1]), 
-                                  branding_url, fill=branding_shadow_color, font=branding_font)
+    Args:
+        text (str): The text to fit.
+        font_names (list): Font preferences passed to load_bundled_font.
+        max_w (int): The maximum line width in pixels.
+        max_lines (int): The maximum number of wrapped lines.
+        max_size (int): The preferred (largest) font size.
+        min_size (int): The smallest font size to fall back to.
+        step (int): The size decrement between candidates.
+
+    Returns:
+        tuple: (size, font, wrapped_lines) for the chosen size.
+    """
+    font = load_bundled_font(font_names, max_size)
+    lines = wrap_text(text, font, max_w)
+    if len(lines) <= max_lines:
+        return max_size, font, lines
+
+    # Find the smallest decrement count that fits; fall back to min_size if none does
+    lo, hi = 1, (max_size - min_size) // step
+    while lo < hi:
+        mid = (lo + hi) // 2
+        mid_font = load_bundled_font(font_names, max_size - mid * step)
+        if len(wrap_text(text, mid_font, max_w)) <= max_lines:
+            hi = mid
+        else:
+            lo = mid + 1
+
+    size = max_size - lo * step
+    logger.info(f"Text too long, reducing main font size to {size}")
+    font = load_bundled_font(font_names, size)
+    return size, font, wrap_text(text, font, max_w)
+
+def _prewarm_fonts():
+    """Loads every (font, size) pair a render can ask for into the font cache.
+
+    Title sizes come from fit_font_size's BASE_TITLE_FONT_SIZE..MIN_TITLE_FONT_SIZE
+    range scaled per style; the button and branding fonts use fixed sizes.
+    """
+    title_sizes = range(BASE_TITLE_FONT_SIZE, MIN_TITLE_FONT_SIZE - 1, -TITLE_FONT_SIZE_STEP)
+    sized_fonts = [(MAIN_FONT_PREFERENCES, size) for size in title_sizes]
+    for font_names, scale in ((STYLE1_FONT_PREFERENCES, 1.05), (STYLE2_FONT_PREFERENCES, 1.0),
+                              (STYLE3_FONT_PREFERENCES, 1.0), (STYLE4_FONT_PREFERENCES, 1.1),
+                              (STYLE5_FONT_PREFERENCES, 1.2)):
+        sized_fonts.extend((font_names, int(size * scale)) for size in title_sizes)
+    sized_fonts.extend((button_style['font_preferences'], 33) for button_style in READ_MORE_BUTTON_STYLES.values())
+    sized_fonts.extend([
+        (BRANDING_FONT_PREFERENCES, 30), (STYLE1_FONT_PREFERENCES, 36),
+        (STYLE2_BRANDING_FONT_PREFERENCES, 38), (STYLE3_FONT_PREFERENCES, STYLE3_BRANDING_FONT_SIZE),
+        (STYLE4_FONT_PREFERENCES, 40), (STYLE5_FONT_PREFERENCES, 40),
+    ])
+    for font_names, size in sized_fonts:
+        load_bundled_font(font_names, size)
+
+# Warm the font cache in the background, so the first requests of a worker do not
+# pay for parsing the TTF files
+threading.Thread(target=_prewarm_fonts, name='font-prewarm', daemon=True).start()
+
+# Thread pool for the CPU-bound Pillow rendering; Pillow releases the GIL for most
+# heavy operations, so one worker per core keeps them all busy
+PIL_WORKERS = os.cpu_count() or 4
+PIL_POOL = ThreadPoolExecutor(max_workers=PIL_WORKERS, thread_name_prefix='pil')
+
+# Let Pillow's allocator keep freed image blocks for reuse instead of returning them
+# to the OS, so the full-size canvases and masks of the next render are recycled
+# rather than faulted in afresh. Applied here (not only by Pillow at import) so that
+# PILLOW_BLOCKS_MAX can also come from .env. Retained blocks (up to 16 MB each) are
+# never given back, and every Gunicorn worker keeps its own, so the default is a
+# small fixed number per process rather than one that grows with the core count.
+PILLOW_BLOCKS_MAX = int(os.getenv('PILLOW_BLOCKS_MAX', 4))
+Image.core.set_blocks_max(PILLOW_BLOCKS_MAX)
+
+@functools.lru_cache(maxsize=256)
+def _enhance_lut(factor, base):
+    """Returns a point() table equal to ImageEnhance blending a flat `base` image by factor (> 1).
+
+    Contrast (blend with the mean gray) and Brightness (blend with black) depend on
+    each channel value alone, so a lookup table reproduces them exactly in one pass.
+    """
+    table = []
+    for value in range(256):
+        # Same float math, truncation and clipping as Pillow's blend for factors above 1
+        blended = np.float32(base) + np.float32(factor) * np.float32(value - base)
+        table.append(0 if blended <= 0 else 255 if blended >= 255 else int(blended))
+    return table * 3  # Same table for R, G and B
+
+@functools.lru_cache(maxsize=32)
+def _solid_layer(size, color):
+    """Returns a cached solid-color RGBA layer.
+
+    The same image is shared between requests, so callers must only paste or
+    composite it and never draw on it (use .copy() for that).
+    """
+    return Image.new('RGBA', size, color)
+
+@functools.lru_cache(maxsize=4)
+def _style5_dark_section(target_size):
+    """Builds the style5 dark overlay with its parabolic top edge (shared, do not mutate).
+
+    Args:
+        target_size (tuple): The (width, height) of the canvas
+
+    Returns:
+        Image: An RGBA layer that is dark below the curve and transparent above it
+    """
+    # Define dimensions for the curved dark shape
+    dark_section_height = 1300  # Height of the dark section from bottom
+    
+    # Parabola parameters (matching the example)
+    peak_height_ratio = 0.6  # Height of peak as fraction of dark section height
+    steepness_factor = 0.3   # How quickly curve drops off from center
+    
+    # Calculate curve positions
+    curve_start_y = target_size[1] - dark_section_height
+    peak_y = dark_section_height * peak_height_ratio
+    center_x = target_size[0] / 2
+    
+    # Calculate parabola scaling factor
+    a = (steepness_factor * peak_y) / (center_x**2)
+    
+    # Create a mask for the curved shape: every pixel on or below the
+    # parabola y = -a * (x - center_x)^2 + peak_y + curve_start_y is filled
+    y, x = np.ogrid[:target_size[1], :target_size[0]]
+    curve_y = -a * (x - center_x)**2 + peak_y + curve_start_y
+    mask = Image.fromarray((y >= curve_y).astype(np.uint8) * 255, 'L')
+    
+    # Create the dark section overlay with the mask
+    dark_section = Image.new('RGBA', target_size, (30, 30, 35, 245))  # Dark gray/black
+    dark_section.putalpha(mask)
+    return dark_section
+
+@functools.lru_cache(maxsize=32)
+def _style4_branding_tile(branding_url, font_size, target_size):
+    """Renders the Style 4 golden branding box with its black text (shared, do not mutate).
+
+    Args:
+        branding_url (str): The branding text
+        font_size (int): The branding font size
+        target_size (tuple): The (width, height) of the canvas
+
+    Returns:
+        tuple: (tile, (x, y)) - an RGBA tile that is transparent outside the box,
+        and the canvas position to composite it at
+    """
+    # Use the same font as the title for consistency
+    style4_branding_font = load_bundled_font(STYLE4_FONT_PREFERENCES, font_size)
+    
+    # Calculate dimensions
+    style4_branding_width, style4_bbox = measure_text(branding_url, style4_branding_font)
+    style4_text_height = style4_bbox[3] - style4_bbox[1]
+    
+    # Define golden box dimensions with padding
+    box_padding_x = 60  # Horizontal padding (30px on each side)
+    box_padding_y = 20  # Vertical padding (10px on top and bottom)
+    box_width = style4_branding_width + box_padding_x
+    box_height = style4_text_height + box_padding_y
+    
+    # Center box horizontally
+    box_x = (target_size[0] - box_width) // 2
+    
+    # Position at bottom of image with more padding from title
+    box_bottom_padding = 30  # Reduced padding from bottom to move box lower
+    box_y = target_size[1] - box_bottom_padding - box_height
+    
+    # Calculate text position using bounding box for accurate centering
+    box_center_x = box_x + (box_width / 2)
+    box_center_y = box_y + (box_height / 2)
+    
+    # Calculate text position using bounding box for accurate centering
+    style4_branding_x = int(box_center_x - (style4_branding_width / 2))
+    
+    # Center the inked area vertically: the bounding box already holds the font's
+    # real offsets below the draw origin, so no ascent approximation is needed
+    style4_branding_y = int(box_center_y - (style4_bbox[1] + style4_bbox[3]) / 2)
+    
+    logger.debug("Style 4 branding box at (%s, %s), %sx%s, text at (%s, %s)",
+                 box_x, box_y, box_width, box_height, style4_branding_x, style4_branding_y)
+    
+    # The tile covers the box and the text (which can overhang short boxes) and starts
+    # on a whole pixel, so shapes drawn at local coordinates round exactly as on the canvas
+    tile_x = math.floor(min(box_x, style4_branding_x + style4_bbox[0]))
+    tile_y = math.floor(min(box_y, style4_branding_y + style4_bbox[1]))
+    tile_right = math.ceil(max(box_x + box_width, style4_branding_x + style4_bbox[2]))
+    tile_bottom = math.ceil(max(box_y + box_height, style4_branding_y + style4_bbox[3]))
+    tile = Image.new('RGBA', (tile_right - tile_x + 1, tile_bottom - tile_y + 1), (0, 0, 0, 0))
+    tile_draw = ImageDraw.Draw(tile)
+    
+    # Golden color for the box (like in the image)
+    gold_color = (230, 190, 60, 255)  # Bright gold color
+    
+    # Draw the box with slight rounding
+    box_rect = [(box_x - tile_x, box_y - tile_y), (box_x + box_width - tile_x, box_y + box_height - tile_y)]
+    tile_draw.rounded_rectangle(box_rect, radius=5, fill=gold_color)
+    
+    # Draw text in black with precise positioning
+    tile_draw.text((style4_branding_x - tile_x, style4_branding_y - tile_y), 
+                   branding_url, fill=(0, 0, 0, 255), font=style4_branding_font)
+    return tile, (tile_x, tile_y)
+
+@functools.lru_cache(maxsize=32)
+def _style3_branding_position(branding_url, target_size):
+    """Centers the Style 3 branding URL in the bottom bar.
+
+    Args:
+        branding_url (str): The branding text
+        target_size (tuple): The (width, height) of the canvas
+
+    Returns:
+        tuple: (font, (x, y)) to draw the branding URL with
+    """
+    # Use same font as title but larger for better visibility
+    style3_branding_font = load_bundled_font(STYLE3_FONT_PREFERENCES, STYLE3_BRANDING_FONT_SIZE)
+    style3_branding_width, style3_bbox = measure_text(branding_url, style3_branding_font)
+    style3_text_height = style3_bbox[3] - style3_bbox[1]
+    
+    # Calculate position in bottom bar
+    bottom_bar_top = target_size[1] - STYLE3_BOTTOM_BAR_HEIGHT
+    style3_branding_x = (target_size[0] - style3_branding_width) // 2
+    style3_branding_y = bottom_bar_top + (STYLE3_BOTTOM_BAR_HEIGHT - style3_text_height) // 2
+    return style3_branding_font, (style3_branding_x, style3_branding_y)
+
+def _style1_box_tile(box_width, box_height):
+    """Renders the Style 1 translucent title box with its drop shadow.
+
+    Args:
+        box_width (int): The box width
+        box_height (int): The box height
+
+    Returns:
+        Image: An RGBA tile, transparent around the box, to composite at the box's
+        top-left corner
+    """
+    corner_radius = 25
+    bg_color = (0, 0, 0, 180)  # Increased opacity to match example
+    shadow_color_box = (0, 0, 0, 70)
+    shadow_offset_box = (5, 5)
+    
+    # Rectangle corners are inclusive, hence the +1
+    box_surface = Image.new('RGBA', (box_width + shadow_offset_box[0] + 1, box_height + shadow_offset_box[1] + 1), (0,0,0,0))
+    box_draw = ImageDraw.Draw(box_surface)
+    # Shadow
+    shadow_rect = [shadow_offset_box,
+                   (box_width + shadow_offset_box[0], box_height + shadow_offset_box[1])]
+    box_draw.rounded_rectangle(shadow_rect, radius=corner_radius, fill=shadow_color_box)
+    # Main box
+    main_rect = [(0, 0), (box_width, box_height)]
+    box_draw.rounded_rectangle(main_rect, radius=corner_radius, fill=bg_color)
+    return box_surface
+
+@functools.lru_cache(maxsize=8)
+def _read_more_button_tile(button_width, button_height, button_color):
+    """Renders the "Read More" button with its drop shadow (shared, do not mutate).
+
+    Args:
+        button_width (int): The button width
+        button_height (int): The button height
+        button_color (tuple): The RGBA button background color
+
+    Returns:
+        Image: An RGBA tile, transparent around the button, to composite at the
+        button's top-left corner
+    """
+    shadow_offset = 4
+    shadow_color = (0, 0, 0, 90)
+    # Rectangle corners are inclusive, hence the extra pixel
+    tile = Image.new('RGBA', (button_width + shadow_offset + 1, button_height + shadow_offset + 1), (0, 0, 0, 0))
+    tile_draw = ImageDraw.Draw(tile)
+    
+    # Draw button shadow
+    shadow_rect = [(shadow_offset, shadow_offset), (button_width + shadow_offset, button_height + shadow_offset)]
+    tile_draw.rounded_rectangle(shadow_rect, radius=25, fill=shadow_color)
+    
+    # Draw button background with rounded corners
+    button_rect = [(0, 0), (button_width, button_height)]
+    tile_draw.rounded_rectangle(button_rect, radius=25, fill=button_color)
+    return tile
+
+@functools.lru_cache(maxsize=16)
+def _corner_mask(size, radius):
+    """Returns the rounded-rectangle L mask for add_rounded_corners (shared, do not mutate)."""
+    mask = Image.new('L', size, 0)
+    mask_draw = ImageDraw.Draw(mask)
+    mask_draw.rounded_rectangle([(0, 0), size], radius=radius, fill=255)
+    return mask
+
+# Corner radius of each style, baked into the PNG unless the client rounds the
+# corners itself (the "rounded": "css" request option)
+STYLE_CORNER_RADII = {'style1': 60, 'style2': 40, 'style3': 60, 'style4': 30, 'style5': 40}
+
+def add_rounded_corners(image, radius=40):
+    """Returns an RGBA copy of the image with transparent rounded corners."""
+    if image.mode != "RGBA":  # The render canvas already is; converting would only copy it
+        image = image.convert("RGBA")
+    mask = _corner_mask(image.size, radius)
+    result = Image.new('RGBA', image.size, (0, 0, 0, 0))
+    result.paste(image, (0, 0), mask)
+    return result
+
+def _render_pinterest_image(image_data, title, style, branding_url, round_corners=True):
+    """
+    Renders the Pinterest pin for a generated background image and saves it as a PNG.
+
+    This is pure Pillow/NumPy work, so it is run on PIL_POOL rather than on the event loop.
+
+    Args:
+        image_data (bytes): The background image returned by Runware
+        title (str): The title text to render on the pin
+        style (str): One of style1..style5
+        branding_url (str): Optional branding text, may be empty
+        round_corners (bool): Bake the style's rounded corners into the PNG
+
+    Returns:
+        tuple: (image_filename, image_path) of the saved PNG
+    """
+    # Process the image (reusing existing code from generate_from_prompt)
+    image_buffer = io.BytesIO(image_data)
+    img = Image.open(image_buffer)
+    target_size = PIN_SIZE
+    
+    # Let the JPEG decoder produce RGB directly, at a reduced scale when the
+    # source is at least twice the target size (no-op for other formats)
+    img.draft('RGB', target_size)
+    
+    # Convert to RGB if needed
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    
+    # Resize to Pinterest standard only if needed; bicubic is visually
+    # indistinguishable from Lanczos at these small scale factors
+    if img.size != target_size:
+        img = img.resize(target_size, Image.BICUBIC)
+        
+    # Apply a subtle color enhancement. Contrast and brightness run as lookup-table
+    # passes (identical to ImageEnhance, minus its full-size blend images); color
+    # mixes the channels, so it stays with ImageEnhance
+    contrast_mean = int(ImageStat.Stat(img.convert('L')).mean[0] + 0.5)
+    img = img.point(_enhance_lut(1.1, contrast_mean))
+    img = ImageEnhance.Color(img).enhance(1.15)
+    img = img.point(_enhance_lut(1.05, 0))
+    
+    # Base font size definition
+    base_font_size = BASE_TITLE_FONT_SIZE
+    
+    # Apply modern, low-contrast background effect in a single float pass:
+    # contrast reduction, a cool tint overlay and a vertical darkening ramp
+    bg_effect = np.asarray(img, dtype=np.float32)
+    
+    # Contrast 0.85 around the mean luminance (same as ImageEnhance.Contrast)
+    luminance_mean = int(np.dot(bg_effect, [0.299, 0.587, 0.114]).mean() + 0.5)
+    bg_effect -= luminance_mean
+    bg_effect *= 0.85
+    bg_effect += luminance_mean
+    
+    # Blend the tint color (66, 66, 77) at alpha 25
+    tint_alpha = 25 / 255
+    bg_effect *= 1 - tint_alpha
+    bg_effect += np.array([66, 66, 77], dtype=np.float32) * tint_alpha
+    
+    # Vertical darkening ramp: one black alpha value per row, broadcast across the width
+    progress = np.arange(target_size[1]) / target_size[1]
+    gradient_alpha = np.where(progress < 0.5, 15 * progress, 15 * (1 + (progress - 0.5))).astype(np.uint8)
+    bg_effect *= (1 - gradient_alpha / 255).astype(np.float32)[:, None, None]
+    
+    np.clip(bg_effect, 0, 255, out=bg_effect)
+    # Every later step composites or draws with alpha, so the canvas is RGBA
+    # from here on and is never converted again until the final touches
+    img = Image.fromarray(np.rint(bg_effect).astype(np.uint8), 'RGB').convert('RGBA')
+    
+    # Additional background treatment for Style 2 to improve text readability
+    if style == 'style2':
+        # Add a central area with more transparency for focal point
+        center_x, center_y = target_size[0] // 2, target_size[1] // 2
+        max_radius = max(target_size) * 0.7
+        
+        # Sample Pillow's built-in 256x256 radial gradient (value = sqrt(2) * distance
+        # from its centre pixel) over a box that keeps the whole image inside it
+        half_extent = max(center_x, center_y, target_size[0] - center_x, target_size[1] - center_y) + 0.5
+        scale = 127.5 / half_extent  # Gradient pixels per image pixel
+        distance = Image.radial_gradient('L').resize(target_size, Image.BILINEAR, box=(
+            128.5 - (center_x + 0.5) * scale, 128.5 - (center_y + 0.5) * scale,
+            128.5 + (target_size[0] - center_x - 0.5) * scale,
+            128.5 + (target_size[1] - center_y - 0.5) * scale))
+        
+        # More opacity at edges (up to 100), less in center (min 40);
+        # the gradient value reaching max_radius is capped at 1.0
+        max_radius_value = 2 ** 0.5 * scale * max_radius
+        opacity = distance.point(lambda v: int(40 + 60 * min(1.0, v / max_radius_value)))
+        
+        # Create a semi-transparent black overlay carrying the gradient as alpha
+        black = Image.new('L', target_size, 0)
+        overlay = Image.merge('RGBA', (black, black, black, opacity))
+        
+        # Apply overlay to image (in place; the canvas stays opaque)
+        img.alpha_composite(overlay)
+    
+    # Style 3 implementation - add black bars at top and bottom
+    elif style == 'style3':
+        # First calculate text dimensions to determine appropriate top bar height
+        style3_font_scale = 1.0  # Reduced from 1.1 to ensure text fits better in the box
+        style3_font = load_bundled_font(STYLE3_FONT_PREFERENCES, int(base_font_size * style3_font_scale))
+        temp_font = style3_font if style3_font else font
+        
+        # Calculate wrapped text height
+        max_text_width = target_size[0] - 100  # Increased padding from 80 to 100 for better fit
+        
+        # Wrap text for measurement
+        temp_wrapped_lines = wrap_text(title, temp_font, max_text_width)
+        
+        # Calculate total text height
+        line_heights_temp = []
+        for line in temp_wrapped_lines:
+            try:
+                bbox = measure_text(line, temp_font)[1]
+                line_heights_temp.append(bbox[3] - bbox[1])
+            except (AttributeError, OSError, ValueError):
+                # Fallback if textbbox not available
+                line_heights_temp.append(base_font_size * style3_font_scale)
+        
+        # Calculate total height with spacing
+        total_text_height = sum(h * 1.2 for h in line_heights_temp)
+        
+        # Define dimensions for the black bars - dynamic top bar
+        top_padding = 50  # Padding above and below text
+        top_bar_height = int(total_text_height + (top_padding * 2))  # Adjust based on text
+        top_bar_height = max(170, min(320, top_bar_height))  # Min/max bounds for aesthetics
+        
+        # Create black bars with slight transparency for elegance
+        top_bar_color = (33, 33, 35, 240)  # #212123 with transparency
+        top_bar = _solid_layer((target_size[0], top_bar_height), top_bar_color)
+        bottom_bar = _solid_layer((target_size[0], STYLE3_BOTTOM_BAR_HEIGHT), top_bar_color)  # Use same color for bottom bar
+        
+        # Overlay the bars directly on the opaque canvas
+        img.paste(top_bar, (0, 0), top_bar)
+        img.paste(bottom_bar, (0, target_size[1] - STYLE3_BOTTOM_BAR_HEIGHT), bottom_bar)
+        
+    # Style 4 implementation - Image at top, dark rectangle at bottom with title and branding
+    elif style == 'style4':
+        # Define dimensions for bottom rectangle
+        bottom_rect_height = 450  # Bottom dark rectangle height
+        
+        # Create bottom dark rectangle with slight transparency
+        bottom_rect_color = (30, 30, 30, 245)  # Dark gray/black with transparency
+        bottom_rect = _solid_layer((target_size[0], bottom_rect_height), bottom_rect_color)
+        
+        # Overlay the bottom rectangle directly on the opaque canvas
+        img.paste(bottom_rect, (0, target_size[1] - bottom_rect_height), bottom_rect)
+        
+    # Style 5 implementation - Image at top with curved dark shape at bottom
+    elif style == 'style5':
+        # Create a new image for composition (transparent, Pillow's default fill)
+        new_img = Image.new('RGBA', target_size)
+        
+        # Position the image so its center is at the top portion
+        # First calculate the offset needed to move the image up
+        # For 1:1 original image that's 1024x1024, we need to offset to show the center
+        img_width, img_height = img.size
+        
+        # Calculate vertical offset to position the image lower to hide the bottom portion
+        # Using a negative offset to descend (move down) the image
+        # This will hide more of the image behind the dark curved area
+        y_offset = -150  # Negative value moves the image down
+        
+        # The curved dark section only depends on the canvas size, so it is built once
+        dark_section = _style5_dark_section(target_size)
+        
+        # Paste the main image with the calculated offset to center it in the top portion
+        new_img.paste(img, (0, y_offset))
+        
+        # Then overlay the dark section using the mask (in place, no third canvas)
+        new_img.alpha_composite(dark_section)
+        
+        # Update img for further processing
+        img = new_img
+    
+    # Prepare for text overlay
+    draw = ImageDraw.Draw(img) # Initial draw object on base image
+    
+    # --- Font Loading ---
+    branding_font_size = 60 # Note: subtitle font seems unused currently
+
+    logger.debug("Loading main font...")
+
+    # --- Auto-scale font size / Text wrapping ---
+    max_width = target_size[0] - 120 # Max width for title text
+    
+    # For style 2, increase the text padding from edges
+    if style == 'style2':
+        # Use more padding to keep text further from edges
+        max_width = target_size[0] - 160
+    
+    # Dynamically adjust font size so the title wraps to at most 6 lines
+    base_font_size, font, wrapped_lines = fit_font_size(title, MAIN_FONT_PREFERENCES, max_width,
+                                                        max_size=base_font_size)
+        
+    # Calculate text height and position
+    line_heights = [bbox[3] - bbox[1] for bbox in (measure_text(line, font)[1] for line in wrapped_lines)]
+    line_spacing_factor = 1.3
+    total_text_height = sum(lh * line_spacing_factor for lh in line_heights) - (line_heights[0] * (line_spacing_factor - 1.2)) # Adjust first line spacing
+    available_height = target_size[1]
+    
+    # Adjust text position based on style
+    if style == 'style2':
+        # For Style 2, position text at the top of the image with proper padding
+        text_y = compute_top_title_y(total_text_height, available_height)
+    elif style == 'style3':
+        # For Style 3, position text in the top black bar, centered vertically
+        # We need to reference the top_bar_height calculated earlier
+        text_y = (top_bar_height - total_text_height) // 2  # Center text vertically in top bar
+        # Ensure perfect centering by adjusting for any rounding errors
+        text_y = max(20, text_y)  # Ensure minimum padding from top, but allow more centering
+    elif style == 'style4':
+        # For Style 4, position text in the bottom rectangle
+        # Position based on available space within the bottom rectangle
+        bottom_rect_height = 450  # Must match the value defined earlier
+        
+        # Define font scale for style 4
+        style4_font_scale = 1.1  # Same scale used in the text drawing section
+        
+        # Calculate available space, reserving room for branding URL box
+        branding_box_height = 100  # Estimated height including padding
+        branding_box_margin = 50   # Space between title and branding box
+        
+        # Calculate available height for the title text
+        available_title_height = bottom_rect_height - branding_box_height - branding_box_margin
+        
+        # If title is very long, adjust font size
+        if len(wrapped_lines) > 3 or len(title) > 50:
+            # More aggressive font size reduction for long titles
+            # Base reduction on both line count and total character length
+            line_factor = max(0, len(wrapped_lines) - 3) 
+            length_factor = max(0, len(title) - 50) // 10  # Every 10 chars over 50
+            
+            # Combined reduction factor (larger of the two plus half of the smaller)
+            if line_factor > length_factor:
+                font_reduction = line_factor * 8 + (length_factor * 4)
+            else:
+                font_reduction = length_factor * 8 + (line_factor * 4)
+            
+            # Cap the reduction to avoid too small text
+            font_reduction = min(30, font_reduction)  # Maximum 30px reduction
+            
+            # Apply reduction and reload font
+            original_font_size = int(base_font_size * style4_font_scale)
+            new_font_size = max(40, original_font_size - font_reduction)  # Ensure minimum 40px size
+            
+            logger.debug("Reducing Style 4 title font from %spx to %spx (reduction: %spx)", original_font_size, new_font_size, font_reduction)
+            
+            style4_font = load_bundled_font(STYLE4_FONT_PREFERENCES, new_font_size)
+            font = style4_font if style4_font else font
+            
+            # Rewrap text with the new font size
+            max_width = target_size[0] - 120
+            wrapped_lines = wrap_text(title, font, max_width)
+            
+            # Recalculate line heights with new font
+            line_heights = [bbox[3] - bbox[1] for bbox in (measure_text(line, font)[1] for line in wrapped_lines)]
+            
+            # Use tighter line spacing for reduced font sizes
+            if font_reduction > 15:
+                line_spacing_factor = 1.1  # Very tight spacing for heavily reduced fonts
+            else:
+                line_spacing_factor = 1.2  # Somewhat reduced spacing
+        else:
+            line_spacing_factor = 1.3  # Normal spacing for shorter titles
+        
+        # Recalculate total text height with possibly updated line heights and spacing
+        total_text_height = sum(lh * line_spacing_factor for lh in line_heights) - (line_heights[0] * (line_spacing_factor - 1.2))
+        
+        # Top position - keep title in upper portion of the dark rectangle with padding
+        top_padding_in_rect = 40  # Padding from top of dark rectangle
+        text_y = target_size[1] - bottom_rect_height + top_padding_in_rect
+        
+        # Make sure title doesn't extend into area reserved for branding URL
+        max_title_bottom = target_size[1] - branding_box_height - branding_box_margin
+        
+        # If title would overflow into branding area, adjust position upward
+        if text_y + total_text_height > max_title_bottom:
+            text_y = max_title_bottom - total_text_height
+            # Ensure minimum padding from top
+            text_y = max(target_size[1] - bottom_rect_height + 20, text_y)
+        
+        logger.debug("Style 4: Title height=%s, position y=%s, max bottom=%s", total_text_height, text_y, max_title_bottom)
+    elif style == 'style5':
+        # For Style 5, position title in the curved dark section
+        text_y = compute_style5_title_y(total_text_height, target_size[1])
+    else: # Style 1
+        # Style 1 positioning - also moved to top (same as Style 2)
+        text_y = compute_top_title_y(total_text_height, available_height)
+
+    # Vertical advance of every line (the first line uses a fixed 1.2 spacing),
+    # shared by the Style 1 box pre-pass and the drawing loop
+    line_advances = [lh * (line_spacing_factor if i > 0 else 1.2) for i, lh in enumerate(line_heights)]
+
+    # --- Text Background Box (Only for Style 1) ---
+    if style == 'style1':
+        padding = 35
+
+        # Calculate text block bounding box [min_x, min_y, max_x, max_y]
+        text_block_bbox = text_block_bounds([measure_text(line, font)[0] for line in wrapped_lines],
+                                            line_advances, text_y, target_size[0])
+
+        # Make the box wider to match example
+        box_padding_sides = 50
+        
+        # Calculate box dimensions, clamped to the image bounds
+        box_left = max(0, int(text_block_bbox[0] - box_padding_sides))
+        box_top = max(0, int(text_block_bbox[1] - padding))
+        box_right = min(target_size[0], int(text_block_bbox[2] + box_padding_sides))
+        box_bottom = min(target_size[1], int(text_block_bbox[3] + padding * 0.8))
+        box_width = box_right - box_left
+        box_height = box_bottom - box_top
+
+        if box_width > 0 and box_height > 0:
+            # The tile covers just the box and its shadow, and is composited in place.
+            # It is not cached: box sizes follow the widest title line, so they
+            # rarely repeat, while each tile can take a few MB
+            img.alpha_composite(_style1_box_tile(box_width, box_height), dest=(box_left, box_top))
+
+    # --- Text Drawing ---
+    # Resolve the per-style font, colors and effects once, outside the line loop
+    style_stroke_width = 0  # Only Style 2 draws a stroke
+    style_stroke_fill = None
+    style_shadow_blur = 0  # ...and a soft shadow
+    if style == 'style2':
+        # Style 2: Golden text with enhanced shadow for readability
+        # Make title larger for Style 2 but ensure it stays within boundaries
+        style2_font_scale = 1.0 # Increased from 0.9 for larger text
+        
+        # Use EBGaramond-Bold.ttf specifically for Style 2
+        style2_font = load_bundled_font(STYLE2_FONT_PREFERENCES, int(base_font_size * style2_font_scale))
+        # Use the specific font if successfully loaded, otherwise fallback to original font
+        current_font = style2_font if style2_font else font
+        
+        style_side_margin = 40  # Keep text at least 40px from the edges
+        
+        # Change text color to golden (#d7bd45)
+        style_text_color = (215, 189, 69)  # #d7bd45 converted to RGB
+        
+        # Black 1px border, drawn through the glyph mask dilated by one pixel
+        # (a MaxFilter in text_mask), so it needs no extra rasterization
+        style_stroke_width = 1
+        style_stroke_fill = (0, 0, 0, 255)
+        
+        # Enhanced shadow effect - one blurred layer gives the depth that used to
+        # take three stacked layers of decreasing opacity
+        style_shadow_layers = [((4, 4), (0, 0, 0, 130))]
+        style_shadow_blur = 4
+    elif style == 'style3':
+        # Style 3 - use white text on black bars with Nunito or similar font
+        style3_font_scale = 1.0  # Reduced from 1.1 for better fit
+        style3_font = load_bundled_font(STYLE3_FONT_PREFERENCES, int(base_font_size * style3_font_scale))
+        # Use the specific font if successfully loaded, otherwise fallback to original font
+        current_font = style3_font if style3_font else font
+        
+        style_side_margin = 50  # Increased from 40 to 50
+        
+        # Pure white text for high contrast against black bar
+        style_text_color = (255, 255, 255)
+        
+        # Subtle shadow for depth
+        style_shadow_layers = [((2, 2), (0, 0, 0, 100))]
+    elif style == 'style4':
+        # Style 4: Gold-colored text in the bottom rectangle using Vidaloka font
+        style4_font_scale = 1.1  # Scale up font size for Style 4 title
+        
+        # Load Vidaloka font for Style 4
+        style4_font = load_bundled_font(STYLE4_FONT_PREFERENCES, int(base_font_size * style4_font_scale))
+        # Use the specific font if successfully loaded, otherwise fallback to original font
+        current_font = style4_font if style4_font else font
+        
+        style_side_margin = 40
+        
+        # Use the specified gold color (#d7bd45)
+        style_text_color = (215, 189, 69)  # #d7bd45 converted to RGB
+        
+        # Subtle shadow for depth against dark background
+        style_shadow_layers = [((2, 2), (0, 0, 0, 150))]
+    elif style == 'style5':
+        # Style 5: White bold text in the dark curved section using LeagueSpartan-Bold font
+        style5_font_scale = 1.2  # Scale up font size for more impact
+        
+        # Load LeagueSpartan-Bold font for Style 5
+        style5_font = load_bundled_font(STYLE5_FONT_PREFERENCES, int(base_font_size * style5_font_scale))
+        # Use the specific font if successfully loaded, otherwise fallback to original font
+        current_font = style5_font if style5_font else font
+        
+        style_side_margin = 40
+        
+        # Bright white text for high contrast against dark background
+        style_text_color = (255, 255, 255)  # Pure white
+        
+        # Add subtle shadow for depth
+        style_shadow_layers = [((3, 3), (0, 0, 0, 130))]
+    else: # Style 1
+        # Style 1: Gold text with shadow to match example
+        # Use a slightly different font preference for Style 1
+        style1_font_scale = 1.05  # Slightly larger font
+        style1_font = load_bundled_font(STYLE1_FONT_PREFERENCES, int(base_font_size * style1_font_scale))
+        # Use the specific font if successfully loaded, otherwise fallback to original font
+        current_font = style1_font if style1_font else font
+        
+        style_side_margin = None  # Style 1 lines are only centered
+        
+        # Gold color like in the example
+        style_text_color = (215, 189, 69)  # Gold color (#d7bd45)
+        style_shadow_layers = [((3, 3), (0, 0, 0, 150))]
+    
+    # Ensure perfect centering for each line, measured once up front
+    line_xs = [centered_line_x(measure_text(line, current_font)[0], target_size[0], style_side_margin)
+               for line in wrapped_lines]
+    
+    current_y = text_y # Reset Y position for drawing
+    for line, adjusted_line_x, actual_line_height in zip(wrapped_lines, line_xs, line_advances):
+        # Shadow layers first, then the main text (with its border, if any) on top
+        draw_text_with_shadow(img, (adjusted_line_x, current_y), line, current_font, style_text_color,
+                              style_shadow_layers, style_stroke_width, style_stroke_fill,
+                              style_shadow_blur)
+
+        # !!! IMPORTANT: Re-insert the missing Y increment here !!!
+        current_y += actual_line_height
+
+    # --- Create dark bottom bar for Styles 1 and 2 before any other elements ---
+    if style in ('style1', 'style2') and branding_url:
+        # Define dark bar at bottom for branding URL
+        bottom_bar_height = 60  # Height of bottom bar
+        bottom_bar_color = (0, 0, 0, 200)  # Semi-transparent black, darker than before
+        
+        # Overlay the cached bar at the bottom of the image (draw keeps targeting img).
+        # A masked paste is kept on purpose: draw.rectangle on an RGBA image would
+        # overwrite the pixels instead of blending the bar over them.
+        bottom_bar = _solid_layer((target_size[0], bottom_bar_height), bottom_bar_color)
+        img.paste(bottom_bar, (0, target_size[1] - bottom_bar_height), bottom_bar)
+
+    # --- Draw Branding URL (Re-added from previous version) --- 
+    if branding_url:
+         logger.info("Drawing branding URL: %s", branding_url)
+         # Use the `current_y` value which marks the position *after* the last title line was drawn
+         title_bottom_y = current_y 
+         logger.debug("Position after last title line (current_y) = %s", title_bottom_y)
+
+         try:
+              # Skip drawing for Styles 3 and 4, their branding is drawn in the final touches
+              if style == 'style3':
+                  logger.debug("Skipping regular branding URL draw for Style 3 - handled in bottom bar")
+              elif style == 'style4':
+                  logger.debug("Skipping regular branding URL draw for Style 4 - handled in golden box")
+                  pass
+              else:
+                  # Define branding font and size
+                  branding_font_size = 30  # Default size for branding
+                  branding_font_preferences = BRANDING_FONT_PREFERENCES
+                  
+                  if style == "style1":
+                      # Use the same font as the title and adjust size to fit in the bottom box
+                      branding_font_size = 36  # Reduced from 40 to fit better in the bottom box
+                      branding_font_preferences = STYLE1_FONT_PREFERENCES
+                  elif style == "style2":
+                      # Increase font size for Style 2 branding URL but ensure it fits well
+                      branding_font_size = 38  # Adjusted from 45 to fit better
+                      branding_font_preferences = STYLE2_BRANDING_FONT_PREFERENCES
+                  
+                  branding_font = load_bundled_font(branding_font_preferences, branding_font_size)
+                  if not branding_font:
+                       logger.warning("Branding font failed to load, using default.")
+                       # Use Pillow default with size if possible
+                       try:
+                           branding_font = ImageFont.load_default(size=branding_font_size)
+                       except TypeError:
+                           branding_font = ImageFont.load_default() # Older Pillow
+                       
+                  # Calculate text width and height (getlength/getbbox exist on every
+                  # font type since Pillow 9.2, so no textsize fallback is needed)
+                  branding_width, bbox = measure_text(branding_url, branding_font)
+                  text_height = bbox[3] - bbox[1]
+
+                  # Center text horizontally
+                  branding_x = (target_size[0] - branding_width) // 2
+                  
+                  # Position branding text based on style
+                  if style == 'style5':
+                      # For Style 5, position near the bottom of the curved dark section
+                      padding_from_bottom = 50  # Padding from bottom of the image
+                      branding_y = target_size[1] - padding_from_bottom - text_height
                       
-                      # Draw main text
-                      logger.info(f"Drawing branding URL main text at x={branding_x}, y={branding_y}")
-                      draw.text((branding_x, branding_y), branding_url, fill=branding_text_color, font=branding_font)
+                      # Use white text to match the title, slightly transparent
+                      branding_text_color = (255, 255, 255, 220)
+                  elif style == 'style2':
+                      # For Style 2, position in the bottom dark bar (similar to Style 1)
+                      bottom_bar_height = 60  # Must match the bottom bar height defined earlier
+                      padding_from_bottom = 12  # Adjusted from 15 to center better in the bar
+                      branding_y = target_size[1] - (bottom_bar_height / 2) - (text_height / 2)
                       
-             except Exception as e:
-                  logger.error(f"Error drawing branding URL: {e}", exc_info=True)
-
-        # --- Add "Read More" button for Style 1 ---
-        if style == 'style1' or style == 'style2' or style == 'style3':
-            # Calculate button position - centered below title
-            read_more_text = "Read More"
-            button_font_size = 33  # Reduced from 32 to fit better in container
-            
-            # Set appropriate font based on style
-            if style == 'style1':
-                # Use the same font as the title for Style 1
-                button_font = load_bundled_font(['LeagueSpartan-Bold.ttf', 'Montserrat-Bold.ttf'], button_font_size)
-            elif style == 'style2':
-                # Use EBGaramond for Style 2 to match title
-                button_font = load_bundled_font(['EBGaramond-Bold.ttf', 'LeagueSpartan-Bold.ttf'], button_font_size)
+                      # Use light gold or white text for better contrast against the dark background
+                      branding_text_color = (255, 240, 180, 255)  # Light gold color
+                  elif style == 'style1':
+                      # For Style 1, position in the bottom dark bar
+                      bottom_bar_height = 60  # Must match the bottom bar height defined earlier
+                      padding_from_bottom = 12  # Adjusted from 15 to center better in the bar
+                      branding_y = target_size[1] - (bottom_bar_height / 2) - (text_height / 2)
+                      
+                      # Use gold text color to match the title
+                      branding_text_color = (215, 189, 69, 255)  # Gold color (#d7bd45)
+                  else:
+                      # Default positioning from bottom for other styles (fallback)
+                      padding_bottom = 30
+                      branding_y = target_size[1] - text_height - padding_bottom
+                      branding_text_color = (200, 200, 200)  # Light gray for other styles
+                  
+                  logger.debug("Branding text width=%s, height=%s", branding_width, text_height)
+                  logger.debug("Drawing branding at x=%s, y=%s", branding_x, branding_y)
+                  
+                  # Define shadow effects based on style
+                  if style == 'style1' or style == 'style2':
+                      # Stronger shadow for styles 1 and 2 that might need more contrast
+                      # Multi-layer shadow for better visibility in these styles
+                      shadow_layers = [
+                          ((3, 3), (0, 0, 0, 100)),
+                          ((2, 2), (0, 0, 0, 130)),
+                          ((1, 1), (0, 0, 0, 150))
+                      ]
+                  else:
+                      # Default shadow for other styles
+                      branding_shadow_color = (0, 0, 0, 100)
+                      branding_shadow_offset = (2, 2)  # Increased from (1,1) for better visibility
+                      shadow_layers = [(branding_shadow_offset, branding_shadow_color)]
+                  
+                  # Draw the shadow and the main text from a single rasterization
+                  logger.debug("Drawing branding URL main text at x=%s, y=%s", branding_x, branding_y)
+                  draw_text_with_shadow(img, (branding_x, branding_y), branding_url, branding_font,
+                                        branding_text_color, shadow_layers)
+                  
+         except Exception as e:
+              logger.error(f"Error drawing branding URL: {e}", exc_info=True)
+
+    # --- Add "Read More" button for Styles 1-3 ---
+    button_style = READ_MORE_BUTTON_STYLES.get(style)
+    if button_style:
+        # Calculate button position - centered below title
+        read_more_text = "Read More"
+        button_font_size = 33  # Reduced from 32 to fit better in container
+        button_font = load_bundled_font(button_style['font_preferences'], button_font_size)
+        
+        try:
+            # Calculate button text dimensions
+            button_text_width = measure_text(read_more_text, button_font)[0]
+            text_bbox = measure_text(read_more_text, button_font)[1]
+            button_text_height = text_bbox[3] - text_bbox[1]
+            
+            # Create the button rectangle and shadow for a visual "button" effect
+            button_width = int(target_size[0] * 0.45)  # Increased width from 0.4 to 0.45
+            button_height = 70  # Increased height from 60 to 70
+            button_x = (target_size[0] - button_width) // 2  # Center horizontally
+            
+            # Position button vertically based on style
+            if button_style['y_fraction'] is not None:
+                # Styles 1 and 2 place the button low on the image
+                button_y = int(target_size[1] * button_style['y_fraction'])
             else:  # style3
-                # Use the same font as Style 3 title
-                button_font = load_bundled_font(style3_font_preferences, button_font_size)
+                # For Style 3, position above the bottom black box (not inside it)
+                bottom_bar_top = target_size[1] - STYLE3_BOTTOM_BAR_HEIGHT
+                
+                # Position button above the black box with some padding
+                padding_above_box = 30  # Space between button and top of black box
+                button_y = bottom_bar_top - button_height - padding_above_box
+            
+            # Overlay the cached button tile (shadow included) at the button position
+            img.alpha_composite(_read_more_button_tile(button_width, button_height, button_style['button_color']),
+                                dest=(button_x, button_y))
+            
+            # Draw button text - centered in button
+            text_x = button_x + (button_width - button_text_width) // 2
+            text_y = button_y + (button_height - button_text_height) // 2
+            
+            # Ensure perfect centering by applying a small adjustment if needed
+            # This addresses potential rounding issues with certain font renderings
+            text_x = int(text_x)
+            text_y = int(text_y)
             
+            # Draw text
+            draw.text((text_x, text_y), read_more_text, fill=button_style['text_color'], font=button_font)
+            
+        except Exception as e:
+            logger.error(f"Error drawing 'Read More' button or bottom bar: {e}", exc_info=True)
+
+    # --- Final Touches ---
+    if style == 'style2':
+        # Style 2 final touches - rounded corners only. The whole-image drop shadow
+        # that used to be built here (darken, GaussianBlur(15), offset by 10px) was
+        # overwritten by the unmasked paste of the image on top and cropped away,
+        # so it never reached the output
+        if round_corners:
+            img = add_rounded_corners(img, radius=STYLE_CORNER_RADII['style2']) # Apply corners LAST
+    elif style == 'style1':
+        # Style 1 final touches - add rounded corners for Pinterest suitability
+        # Apply more pronounced rounded corners - increased radius for Pinterest-style rounding
+        if round_corners:
+            img = add_rounded_corners(img, radius=STYLE_CORNER_RADII['style1'])
+        
+        # Ensure proper conversion back to RGB for saving
+        img = img.convert("RGB")
+    elif style == 'style3':
+        # Style 3 final touches - add subtle gradient to the bars for dimension
+        # Apply rounded corners to the entire image with larger radius for more pronounced corners
+        if round_corners:
+            img = add_rounded_corners(img, radius=STYLE_CORNER_RADII['style3'])
+        
+        # --- Specific fix for Style 3 branding URL ---
+        if branding_url:
             try:
-                # Calculate button text dimensions
-                button_text_width = draw.textlength(read_more_text, font=button_font)
-                text_bbox = draw.textbbox((0, 0), read_more_text, font=button_font)
-                button_text_height = text_bbox[3] - text_bbox[1]
+                # The position only depends on the URL and canvas size, so it is cached
+                style3_branding_font, (style3_branding_x, style3_branding_y) = \
+                    _style3_branding_position(branding_url, target_size)
                 
-                # Create the button rectangle and shadow for a visual "button" effect
-                button_width = int(target_size[0] * 0.45)  # Increased width from 0.4 to 0.45
-                button_height = 70  # Increased height from 60 to 70
-                button_x = (target_size[0] - button_width) // 2  # Center horizontally
+                logger.debug("STYLE 3 FIX: Drawing branding at x=%s, y=%s", style3_branding_x, style3_branding_y)
                 
-                # Position button vertically based on style
-                if style == 'style1':
-                    # Position button lower on the image for Style 1
-                    button_y = int(target_size[1] * 0.88)  # 88% down the image (changed from 80%)
-                elif style == 'style2':
-                    # Position button lower on the image for Style 2 too
-                    button_y = int(target_size[1] * 0.85)  # 85% down the image
-                else:  # style3
-                    # For Style 3, position above the bottom black box (not inside it)
-                    bottom_bar_height = 180  # Must match the value from style3 implementation
-                    bottom_bar_top = target_size[1] - bottom_bar_height
-                    
-                    # Position button above the black box with some padding
-                    padding_above_box = 30  # Space between button and top of black box
-                    button_y = bottom_bar_top - button_height - padding_above_box
+                # Draw the branding URL with full opacity white over a shadow for better visibility
+                shadow_offset = 3
+                draw_text_with_shadow(img, (style3_branding_x, style3_branding_y), branding_url,
+                                      style3_branding_font, (255, 255, 255, 255),
+                                      [((shadow_offset, shadow_offset), (0, 0, 0, 150))])
+            except Exception as e:
+                logger.error(f"Style 3 branding URL fix error: {e}")
+        
+        # Ensure proper conversion back to RGB for saving
+        img = img.convert("RGB")
+    elif style == 'style4':
+        # Style 4 final touches
+        # Apply rounded corners to the entire image
+        if round_corners:
+            img = add_rounded_corners(img, radius=STYLE_CORNER_RADII['style4'])
+        
+        # Add golden box for branding URL if present
+        if branding_url:
+            style4_branding_font_size = 40  # Good size for visibility in the box
+            try:
+                # The box only depends on the URL, font size and canvas size, so the
+                # rendered tile is reused across requests
+                style4_tile, style4_tile_position = _style4_branding_tile(branding_url, style4_branding_font_size, target_size)
+                img.alpha_composite(style4_tile, dest=style4_tile_position)
                 
-                # Create button overlay
-                button_overlay = Image.new('RGBA', target_size, (0, 0, 0, 0))
-                button_draw = ImageDraw.Draw(button_overlay)
+                # This approach bypasses the regular branding URL drawing code
+                # Set a flag to prevent double-drawing
+                style4_branding_done = True
                 
-                # Draw button background with rounded corners
-                button_rect = [
-                    (button_x, button_y),
-                    (button_x + button_width, button_y + button_height)
-                ]
+            except Exception as e:
+                logger.error(f"Error drawing Style 4 golden branding box: {e}")
+                style4_branding_done = False
+        
+        # Ensure proper conversion back to RGB for saving
+        img = img.convert("RGB")
+    elif style == 'style5':
+        # Style 5 final touches - add rounded corners for Pinterest suitability
+        # Apply rounded corners to the entire image
+        if round_corners:
+            img = add_rounded_corners(img, radius=STYLE_CORNER_RADII['style5'])
+        
+        # Add white box for branding URL if present
+        if branding_url:
+            # Use the same font as the title for consistency
+            style5_branding_font_size = 40  # Good size for visibility in the box
+            style5_branding_font_preferences = STYLE5_FONT_PREFERENCES  # Use same font preferences as title
+            style5_branding_font = load_bundled_font(style5_branding_font_preferences, style5_branding_font_size)
+            
+            try:
+                # Make sure we have a draw object for the current image state
+                draw = ImageDraw.Draw(img)
                 
-                # Draw button shadow
-                shadow_offset = 4
-                shadow_color = (0, 0, 0, 90)
-                shadow_rect = [
-                    (button_x + shadow_offset, button_y + shadow_offset),
-                    (button_x + button_width + shadow_offset, button_y + button_height + shadow_offset)
-                ]
-                button_draw.rounded_rectangle(shadow_rect, radius=25, fill=shadow_color)
+                # Calculate dimensions
+                style5_branding_width = measure_text(branding_url, style5_branding_font)[0]
+                style5_bbox = measure_text(branding_url, style5_branding_font)[1]
+                style5_text_height = style5_bbox[3] - style5_bbox[1]
                 
-                # Draw button background - adjust color based on style
-                if style == 'style1':
-                    button_color = (200, 200, 200, 240)  # Light gray with higher opacity
-                elif style == 'style2':
-                    button_color = (230, 220, 180, 240)  # Cream color that complements the gold
-                else:  # style3
-                    button_color = (220, 220, 220, 240)  # Light gray to contrast with the black box
+                # Define white box dimensions with padding
+                box_padding_x = 60  # Horizontal padding (30px on each side)
+                box_padding_y = 20  # Vertical padding (10px on top and bottom)
+                box_width = style5_branding_width + box_padding_x
+                box_height = style5_text_height + box_padding_y
                 
-                button_draw.rounded_rectangle(button_rect, radius=25, fill=button_color)
+                # Center box horizontally
+                box_x = (target_size[0] - box_width) // 2
                 
-                # Overlay button on image
-                img = Image.alpha_composite(img, button_overlay)
-                draw = ImageDraw.Draw(img)
+                # Position at bottom of image with padding - adjust for style5 curved section
+                box_bottom_padding = 40  # Padding from bottom of image
+                box_y = target_size[1] - box_bottom_padding - box_height
                 
-                # Draw button text - centered in button
-                text_x = button_x + (button_width - button_text_width) // 2
-                text_y = button_y + (button_height - button_text_height) // 2
+                # White color for the box with slight transparency for style
+                white_color = (255, 255, 255, 245)  # Almost fully opaque white
                 
-                # Ensure perfect centering by applying a small adjustment if needed
-                # This addresses potential rounding issues with certain font renderings
-                text_x = int(text_x)
-                text_y = int(text_y)
+                # Draw the box with slight rounding
+                box_rect = [(box_x, box_y), (box_x + box_width, box_y + box_height)]
+                draw.rounded_rectangle(box_rect, radius=8, fill=white_color)
                 
-                # Text color based on style
-                if style == 'style1':
-                    text_color = (80, 80, 80)  # Darker gray text
-                elif style == 'style2':
-                    text_color = (90, 80, 50)  # Dark gold/brown text
-                else:  # style3
-                    text_color = (50, 50, 50)  # Nearly black text for good contrast
+                # Calculate text position using bounding box for accurate centering
+                box_center_x = box_x + (box_width / 2)
+                box_center_y = box_y + (box_height / 2)
                 
-                # Draw text
-                draw.text((text_x, text_y), read_more_text, fill=text_color, font=button_font)
+                # Calculate text position using bounding box for accurate centering
+                style5_branding_x = int(box_center_x - (style5_branding_width / 2))
                 
-            except Exception as e:
-                logger.error(f"Error drawing 'Read More' button or bottom bar: {e}", exc_info=True)
-
-        # --- Final Touches ---
-        # Apply professional shadow effect to the entire image for Style 2
-        if style == 'style2':
-            # Convert to RGBA if not already
-            img = img.convert("RGBA")
-            
-            # Create a shadow layer
-            shadow_layer = Image.new('RGBA', target_size, (0, 0, 0, 0))
-            img_shadow = img.copy()
-            
-            # Create shadow by darkening the image copy
-            shadow_opacity = 180  # Higher value = darker shadow
-            shadow_overlay = Image.new('RGBA', target_size, (0, 0, 0, shadow_opacity))
-            img_shadow = Image.alpha_composite(img_shadow, shadow_overlay)
-            
-            # Blur the shadow
-            img_shadow = img_shadow.filter(ImageFilter.GaussianBlur(radius=15))
-            
-            # Create a new image for the composition
-            composite = Image.new('RGBA', (target_size[0] + 20, target_size[1] + 20), (0, 0, 0, 0))
-            
-            # Place shadow offset behind the main image
-            composite.paste(img_shadow, (10, 10))
-            
-            # Place the main image on top
-            composite.paste(img, (0, 0))
-            
-            # Crop to remove excess shadow edges if needed
-            img = composite.crop((0, 0, target_size[0], target_size[1]))
-            
-            # Apply rounded corners to the entire image
-            img = add_rounded_corners(img) # Apply corners LAST
-        elif style == 'style1':
-            # Style 1 final touches - add rounded corners for Pinterest suitability
-            img = img.convert("RGBA")
-            
-            # Apply more pronounced rounded corners - increased radius for Pinterest-style rounding
-            img = add_rounded_corners(img, radius=60)
-            
-            # Ensure proper conversion back to RGB for saving
-            img = img.convert("RGB")
-        elif style == 'style3':
-            # Style 3 final touches - add subtle gradient to the bars for dimension
-            img = img.convert("RGBA")
-            
-            # Apply rounded corners to the entire image with larger radius for more pronounced corners
-            img = add_rounded_corners(img, radius=60)  # Increased from 40 to 60 for more pronounced corners
-            
-            # --- Specific fix for Style 3 branding URL ---
-            if branding_url:
-                # Make sure we have a draw object for the current image state
-                draw = ImageDraw.Draw(img)
+                # Position text with baseline correction to center it vertically
+                style5_branding_y = int(box_center_y - (style5_text_height / 2))
                 
-                # Use same font as title but larger for better visibility
-                style3_branding_font_size = 60  # Very large for visibility
-                style3_branding_font = load_bundled_font(style3_font_preferences, style3_branding_font_size)
+                # Apply additional vertical adjustment to fix centering if needed
+                vertical_adjustment = -5  # Adjust if text still appears too low
+                style5_branding_y += vertical_adjustment
                 
-                # Calculate dimensions
-                try:
-                    style3_branding_width = draw.textlength(branding_url, font=style3_branding_font)
-                    style3_bbox = draw.textbbox((0,0), branding_url, font=style3_branding_font)
-                    style3_text_height = style3_bbox[3] - style3_bbox[1]
-                    
-                    # Calculate position in bottom bar
-                    bottom_bar_height = 180  # Must match the value used earlier
-                    bottom_bar_top = target_size[1] - bottom_bar_height
-                    style3_branding_x = (target_size[0] - style3_branding_width) // 2
-                    style3_branding_y = bottom_bar_top + (bottom_bar_height - style3_text_height) // 2
-                    
-                    logger.info(f"STYLE 3 FIX: Drawing branding at x={style3_branding_x}, y={style3_branding_y}")
-                    
-                    # Add shadow for better visibility
-                    shadow_offset = 3
-                    draw.text((style3_branding_x + shadow_offset, style3_branding_y + shadow_offset), 
-                            branding_url, fill=(0, 0, 0, 150), font=style3_branding_font)
-                    
-                    # Draw the branding URL with full opacity white
-                    draw.text((style3_branding_x, style3_branding_y), 
-                            branding_url, fill=(255, 255, 255, 255), font=style3_branding_font)
-                except Exception as e:
-                    logger.error(f"Style 3 branding URL fix error: {e}")
-            
-            # Ensure proper conversion back to RGB for saving
-            img = img.convert("RGB")
-        elif style == 'style4':
-            # Style 4 final touches
-            img = img.convert("RGBA")
-            
-            # Apply rounded corners to the entire image
-            img = add_rounded_corners(img, radius=30)  # More subtle corners for this style
-            
-            # Add golden box for branding URL if present
-            if branding_url:
-                # Use the same font as the title for consistency
-                style4_branding_font_size = 40  # Good size for visibility in the box
-                style4_branding_font_preferences = style4_font_preferences  # Use same font preferences as title
-                style4_branding_font = load_bundled_font(style4_branding_font_preferences, style4_branding_font_size)
+                # Get more precise text measurements for perfect centering
+                # Recalculate using textbbox for the specific text string
+                text_bbox = measure_text(branding_url, style5_branding_font)[1]
+                precise_width = text_bbox[2] - text_bbox[0]
+                precise_height = text_bbox[3] - text_bbox[1]
                 
-                try:
-                    # Make sure we have a draw object for the current image state
-                    draw = ImageDraw.Draw(img)
-                    
-                    # Calculate dimensions
-                    style4_branding_width = draw.textlength(branding_url, font=style4_branding_font)
-                    style4_bbox = draw.textbbox((0,0), branding_url, font=style4_branding_font)
-                    style4_text_height = style4_bbox[3] - style4_bbox[1]
-                    
-                    # Define golden box dimensions with padding
-                    box_padding_x = 60  # Horizontal padding (30px on each side)
-                    box_padding_y = 20  # Vertical padding (10px on top and bottom)
-                    box_width = style4_branding_width + box_padding_x
-                    box_height = style4_text_height + box_padding_y
-                    
-                    # Center box horizontally
-                    box_x = (target_size[0] - box_width) // 2
-                    
-                    # Position at bottom of image with more padding from title
-                    box_bottom_padding = 30  # Reduced padding from bottom to move box lower
-                    box_y = target_size[1] - box_bottom_padding - box_height
-                    
-                    # Golden color for the box (like in the image)
-                    gold_color = (230, 190, 60, 255)  # Bright gold color
-                    
-                    # Draw the box with slight rounding
-                    box_rect = [(box_x, box_y), (box_x + box_width, box_y + box_height)]
-                    draw.rounded_rectangle(box_rect, radius=5, fill=gold_color)
-                    
-                    # Calculate text position using bounding box for accurate centering
-                    box_center_x = box_x + (box_width / 2)
-                    box_center_y = box_y + (box_height / 2)
-                    
-                    # Calculate text position using bounding box for accurate centering
-                    style4_branding_x = int(box_center_x - (style4_branding_width / 2))
-                    
-                    # Adjust Y position based on bounding box for more accurate centering
-                    # This helps account for the text baseline which can make text appear off-center
-                    # First determine the text's baseline offset
-                    ascent = style4_text_height * 0.75  # Approximate ascent for most fonts
-                    
-                    # Position text with baseline correction to center it vertically
-                    style4_branding_y = int(box_center_y - (style4_text_height / 2))
-                    
-                    # Apply additional vertical adjustment to fix centering if needed
-                    vertical_adjustment = -5  # Adjust if text still appears too low
-                    style4_branding_y += vertical_adjustment
-                    
-                    logger.info(f"Box: x={box_x}, y={box_y}, w={box_width}, h={box_height}")
-                    logger.info(f"Box center: ({box_center_x}, {box_center_y})")
-                    logger.info(f"Text dimensions: w={style4_branding_width}, h={style4_text_height}")
-                    logger.info(f"Adjusted text pos: ({style4_branding_x}, {style4_branding_y})")
-                    
-                    # Draw text in black with precise positioning
-                    draw.text((style4_branding_x, style4_branding_y), 
-                            branding_url, fill=(0, 0, 0, 255), font=style4_branding_font)
-                    
-                    # This approach bypasses the regular branding URL drawing code
-                    # Set a flag to prevent double-drawing
-                    style4_branding_done = True
-                    
-                except Exception as e:
-                    logger.error(f"Error drawing Style 4 golden branding box: {e}")
-                    style4_branding_done = False
-            
-            # Ensure proper conversion back to RGB for saving
-            img = img.convert("RGB")
-        elif style == 'style5':
-            # Style 5 final touches - add rounded corners for Pinterest suitability
-            img = img.convert("RGBA")
-            
-            # Apply rounded corners to the entire image
-            img = add_rounded_corners(img, radius=40)  # Medium rounded corners for this style
-            
-            # Add white box for branding URL if present
-            if branding_url:
-                # Use the same font as the title for consistency
-                style5_branding_font_size = 40  # Good size for visibility in the box
-                style5_branding_font_preferences = style5_font_preferences  # Use same font preferences as title
-                style5_branding_font = load_bundled_font(style5_branding_font_preferences, style5_branding_font_size)
+                # Calculate text position for perfect centering
+                style5_branding_x = int(box_center_x - (precise_width / 2))
                 
-                try:
-                    # Make sure we have a draw object for the current image state
-                    draw = ImageDraw.Draw(img)
-                    
-                    # Calculate dimensions
-                    style5_branding_width = draw.textlength(branding_url, font=style5_branding_font)
-                    style5_bbox = draw.textbbox((0,0), branding_url, font=style5_branding_font)
-                    style5_text_height = style5_bbox[3] - style5_bbox[1]
-                    
-                    # Define white box dimensions with padding
-                    box_padding_x = 60  # Horizontal padding (30px on each side)
-                    box_padding_y = 20  # Vertical padding (10px on top and bottom)
-                    box_width = style5_branding_width + box_padding_x
-                    box_height = style5_text_height + box_padding_y
-                    
-                    # Center box horizontally
-                    box_x = (target_size[0] - box_width) // 2
-                    
-                    # Position at bottom of image with padding - adjust for style5 curved section
-                    box_bottom_padding = 40  # Padding from bottom of image
-                    box_y = target_size[1] - box_bottom_padding - box_height
-                    
-                    # White color for the box with slight transparency for style
-                    white_color = (255, 255, 255, 245)  # Almost fully opaque white
-                    
-                    # Draw the box with slight rounding
-                    box_rect = [(box_x, box_y), (box_x + box_width, box_y + box_height)]
-                    draw.rounded_rectangle(box_rect, radius=8, fill=white_color)
-                    
-                    # Calculate text position using bounding box for accurate centering
-                    box_center_x = box_x + (box_width / 2)
-                    box_center_y = box_y + (box_height / 2)
-                    
-                    # Calculate text position using bounding box for accurate centering
-                    style5_branding_x = int(box_center_x - (style5_branding_width / 2))
-                    
-                    # Position text with baseline correction to center it vertically
-                    style5_branding_y = int(box_center_y - (style5_text_height / 2))
-                    
-                    # Apply additional vertical adjustment to fix centering if needed
-                    vertical_adjustment = -5  # Adjust if text still appears too low
-                    style5_branding_y += vertical_adjustment
-                    
-                    # Get more precise text measurements for perfect centering
-                    # Recalculate using textbbox for the specific text string
-                    text_bbox = draw.textbbox((0, 0), branding_url, font=style5_branding_font)
-                    precise_width = text_bbox[2] - text_bbox[0]
-                    precise_height = text_bbox[3] - text_bbox[1]
-                    
-                    # Calculate text position for perfect centering
-                    style5_branding_x = int(box_center_x - (precise_width / 2))
-                    
-                    # For perfect vertical centering, account for font metrics
-                    # The vertical adjustment is now positive to move text down from the top
-                    vertical_adjustment = 8  # Changed from -8 to +8 to move text down
-                    style5_branding_y = int(box_center_y - (precise_height / 2)) + vertical_adjustment
-                    
-                    logger.info(f"Style 5 box center at ({box_center_x}, {box_center_y})")
-                    logger.info(f"Branding text position at ({style5_branding_x}, {style5_branding_y})")
-                    
-                    # Draw text in black with precise positioning for perfect centering
-                    draw.text((style5_branding_x, style5_branding_y), 
-                            branding_url, fill=(0, 0, 0, 255), font=style5_branding_font)
-                    
-                    # This approach bypasses the regular branding URL drawing code
-                    # Set a flag to prevent double-drawing
-                    style5_branding_done = True
-                    
-                except Exception as e:
-                    logger.error(f"Error drawing Style 5 white branding box: {e}")
-                    style5_branding_done = False
-            else:
+                # For perfect vertical centering, account for font metrics
+                # The vertical adjustment is now positive to move text down from the top
+                vertical_adjustment = 8  # Changed from -8 to +8 to move text down
+                style5_branding_y = int(box_center_y - (precise_height / 2)) + vertical_adjustment
+                
+                logger.debug("Style 5 box center at (%s, %s)", box_center_x, box_center_y)
+                logger.debug("Branding text position at (%s, %s)", style5_branding_x, style5_branding_y)
+                
+                # Draw text in black with precise positioning for perfect centering
+                draw.text((style5_branding_x, style5_branding_y), 
+                        branding_url, fill=(0, 0, 0, 255), font=style5_branding_font)
+                
+                # This approach bypasses the regular branding URL drawing code
+                # Set a flag to prevent double-drawing
+                style5_branding_done = True
+                
+            except Exception as e:
+                logger.error(f"Error drawing Style 5 white branding box: {e}")
                 style5_branding_done = False
-            
-            # Ensure proper conversion back to RGB for saving
-            img = img.convert("RGB")
-        
-        # Create a static directory if it doesn't exist
-        static_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
-        if not os.path.exists(static_dir):
-            os.makedirs(static_dir)
+        else:
+            style5_branding_done = False
         
-        # Generate a unique filename
-        image_filename = f"generated_{int(time.time())}_{uuid.uuid4().hex[:8]}.png"
-        image_path = os.path.join(static_dir, image_filename)
+        # Ensure proper conversion back to RGB for saving
+        img = img.convert("RGB")
+    
+    # Encode first, then name the file after its content: identical renders map to
+    # the same URL (and so to the same browser/CDN cache entry) and are stored once
+    png_buffer = io.BytesIO()
+    img.save(png_buffer, format='PNG', compress_level=PNG_COMPRESS_LEVEL)
+    png_data = png_buffer.getbuffer()
+    image_filename = f"generated_{hashlib.blake2b(png_data, digest_size=12).hexdigest()}.png"
+    image_path = os.path.join(STATIC_DIR, image_filename)
+    
+    # Save the image, unless an identical one is already there. The bytes go out in
+    # one write to a temporary file that is then renamed into place, so a request
+    # for the same name never sees a partially written PNG
+    if not os.path.exists(image_path):
+        tmp_path = f"{image_path}.{uuid.uuid4().hex[:8]}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(png_data)
+        os.replace(tmp_path, image_path)
+    
+    return image_filename, image_path
+
+
+# Cap on concurrent /generate-image requests; each one holds several full-size
+# RGBA images, so excess requests are shed with a 503 instead of queueing up.
+# The cap and the counters below are per process: under Gunicorn every worker
+# admits up to MAX_INFLIGHT_REQUESTS requests
+MAX_INFLIGHT_REQUESTS = int(os.getenv('MAX_INFLIGHT_REQUESTS', 2 * (os.cpu_count() or 4)))
+INFLIGHT_REQUESTS = threading.BoundedSemaphore(MAX_INFLIGHT_REQUESTS)
+
+# Simple request counters, exposed on /metrics
+REQUEST_STATS = {'in_flight': 0, 'completed': 0, 'rejected': 0}
+_request_stats_lock = threading.Lock()
+
+def _count_request(key, delta=1):
+    with _request_stats_lock:
+        REQUEST_STATS[key] += delta
+
+def _finish_request():
+    """Releases the in-flight slot taken for a /generate-image request."""
+    _count_request('in_flight', -1)
+    _count_request('completed')
+    INFLIGHT_REQUESTS.release()
+
+# Pins requested with "async": true are tracked as <job_id>.json files, so that
+# every Gunicorn worker can answer /status/<job_id>, not just the one that started
+# the job. Finished jobs are kept for PIN_JOB_TTL seconds.
+PIN_JOBS_DIR = os.getenv('PIN_JOBS_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'jobs'))
+PIN_JOB_TTL = int(os.getenv('PIN_JOB_TTL', 3600))
+
+def _pin_job_path(job_id):
+    """Returns the state file of a job, or None if job_id is not a valid job id."""
+    if len(job_id) != 32 or any(c not in '0123456789abcdef' for c in job_id):
+        return None  # Also keeps the id from naming a path outside PIN_JOBS_DIR
+    return os.path.join(PIN_JOBS_DIR, f"{job_id}.json")
+
+def _write_pin_job(job_id, state):
+    """Atomically replaces the state file of a job."""
+    path = _pin_job_path(job_id)
+    tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+def _read_pin_job(job_id):
+    """Returns the state of a job, or None for an unknown or expired job."""
+    path = _pin_job_path(job_id)
+    if path is None:
+        return None
+    try:
+        if time.time() - os.stat(path).st_mtime > PIN_JOB_TTL:
+            return None
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _sweep_pin_jobs():
+    """Removes job files last written more than PIN_JOB_TTL seconds ago."""
+    now = time.time()
+    with os.scandir(PIN_JOBS_DIR) as it:
+        for entry in it:
+            try:
+                if now - entry.stat().st_mtime > PIN_JOB_TTL:
+                    os.remove(entry.path)
+            except FileNotFoundError:
+                continue  # Removed by another worker in the meantime
+
+def _start_pin_job(host_url, **pin_args):
+    """Runs _create_pin in the background and returns its job id.
+
+    The job runs on the Runware client's I/O loop (the request's own loop ends with
+    the request) and keeps the request's in-flight slot until it finishes.
+    """
+    job_id = uuid.uuid4().hex
+    os.makedirs(PIN_JOBS_DIR, exist_ok=True)
+    _sweep_pin_jobs()
+    _write_pin_job(job_id, {"status": "pending"})
+    try:
+        loop = runware_client._get_loop()
+        future = asyncio.run_coroutine_threadsafe(_create_pin(host_url, **pin_args), loop)
+    except Exception:
+        os.remove(_pin_job_path(job_id))  # Don't leave a job that stays pending forever
+        raise
+    
+    def _on_done(done_future):
+        try:
+            result, status_code = done_future.result()
+        except Exception as e:  # _create_pin reports its own errors; this is e.g. a cancelled job
+            result, status_code = {"error": f"Error processing image: {str(e)}"}, 500
+        try:
+            _write_pin_job(job_id, {"status": "done", "result": result, "status_code": status_code})
+        except OSError as e:
+            logger.error(f"Could not store the result of pin job {job_id}: {e}")
+        finally:
+            _finish_request()
+    future.add_done_callback(_on_done)
+    return job_id
+
+@app.route('/generate-image', methods=['POST'])
+async def generate_image():
+    # Add check for client availability
+    if runware_client is None:
+        return jsonify({"error": "Runware client is not configured due to missing API key."}), 503 # 503 Service Unavailable
+
+    # Parse request
+    data = request.json
+    if not data:
+        return jsonify({"error": "No JSON data provided"}), 400
+    
+    # Get parameters with the requested names
+    image_prompt = data.get('image_prompt')
+    title = data.get('title')
+    branding_url = data.get('BrandingURL', '')  # Optional parameter for branding/URL footer
+    style = data.get('Style', 'style1')  # Default to style1 if not provided
+    run_async = data.get('async', False)  # Optional: return 202 and a job to poll
+    rounded = data.get('rounded', 'baked')  # Optional: 'css' leaves the corners to the client
+    
+    # Validate required fields
+    if not image_prompt:
+        return jsonify({"error": "Missing image_prompt parameter"}), 400
+    if not title:
+        return jsonify({"error": "Missing title parameter"}), 400
+    if not isinstance(run_async, bool):
+        return jsonify({"error": "async must be true or false"}), 400
+    if rounded not in ('baked', 'css'):
+        return jsonify({"error": "rounded must be 'baked' or 'css'"}), 400
+    
+    # Shed load early when all slots are busy
+    if not INFLIGHT_REQUESTS.acquire(blocking=False):
+        _count_request('rejected')
+        logger.warning(f"Rejecting request: {MAX_INFLIGHT_REQUESTS} requests already in flight")
+        return jsonify({"error": "Server is busy, please retry shortly"}), 503, {"Retry-After": "5"}
+    _count_request('in_flight')
+    
+    host_url = request.host_url.rstrip('/')
+    if run_async:
+        # The job releases the slot when it finishes
+        try:
+            job_id = _start_pin_job(host_url, image_prompt=image_prompt, title=title,
+                                    style=style, branding_url=branding_url, rounded=rounded)
+        except Exception as e:
+            # The job never started, so its slot has to be given back here
+            _count_request('in_flight', -1)
+            INFLIGHT_REQUESTS.release()
+            logger.exception("Could not start background pin job")
+            return jsonify({"error": f"Could not start background job: {str(e)}"}), 500
+        return jsonify({
+            "job_id": job_id,
+            "status": "pending",
+            "status_url": f"{host_url}/status/{job_id}"
+        }), 202
+    
+    try:
+        result, status_code = await _create_pin(host_url, image_prompt, title, style, branding_url, rounded)
+        return jsonify(result), status_code
+    finally:
+        _finish_request()
+
+async def _create_pin(host_url, image_prompt, title, style, branding_url, rounded='baked'):
+    """Generates the background image, renders the pin and saves it.
+
+    Args:
+        host_url (str): The server's base URL, used to build the image URL
+        image_prompt (str): The Runware prompt for the background
+        title (str): The title text
+        style (str): The pin style
+        branding_url (str): The branding text, or ''
+        rounded (str): 'baked' to round the corners in the PNG, 'css' to leave them to the client
+
+    Returns:
+        tuple: (response body dict, HTTP status code)
+    """
+    try:
+        # Generate image using Runware API
+        try:
+            logger.info(f"Generating AI image with Runware API with prompt: {image_prompt}")
+            # Request the Pinterest 2:3 aspect ratio directly (see RUNWARE_IMAGE_SIZE)
+            image_data = await runware_client.generate_image_async(
+                prompt=image_prompt, width=RUNWARE_IMAGE_SIZE[0], height=RUNWARE_IMAGE_SIZE[1])
+            logger.info("Runware AI image generation successful")
+        except Exception as e:
+            # If Runware fails, log the error and return it
+            logger.exception(f"Error generating AI image with Runware API: {str(e)}")
+            return {"error": f"Failed to generate image using Runware API: {str(e)}"}, 500
         
-        # Save the image
-        img.save(image_path, format='PNG')
+        # Render on the Pillow thread pool so the event loop stays free
+        loop = asyncio.get_running_loop()
+        image_filename, image_path = await loop.run_in_executor(
+            PIL_POOL, _render_pinterest_image, image_data, title, style, branding_url, rounded == 'baked')
         
         # Construct image URL
         # Note: This assumes the server is configured to serve static files
         # In a production environment, you might want to use a CDN or dedicated file server
-        host_url = request.host_url.rstrip('/')
         image_url = f"{host_url}/static/{image_filename}"
         
         logger.info(f"Image saved to {image_path}")
         
         # Return JSON with image URL
-        return jsonify({
+        result = {
             "image_url": image_url,
             "status": "success"
-        })
+        }
+        if rounded == 'css':
+            # The corners are square; the client rounds them, e.g. with CSS border-radius
+            result["border_radius"] = STYLE_CORNER_RADII.get(style, STYLE_CORNER_RADII['style1'])
+        return result, 200
     
     except Exception as e:
         logger.exception("Exception during image generation and processing")
-        return jsonify({"error": f"Error processing image: {str(e)}"}), 500
+        return {"error": f"Error processing image: {str(e)}"}, 500
+
+# Result of a pin requested with "async": true
+@app.route('/status/<job_id>')
+def pin_job_status(job_id):
+    job = _read_pin_job(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown or expired job id"}), 404
+    if job['status'] == 'pending':
+        return jsonify({"job_id": job_id, "status": "pending"})
+    return jsonify(job['result']), job['status_code']
+
+# Expose the request counters for monitoring. They cover only the worker process
+# that answers, which is identified by its pid
+@app.route('/metrics')
+def metrics():
+    with _request_stats_lock:
+        stats = dict(REQUEST_STATS)
+    stats['max_in_flight'] = MAX_INFLIGHT_REQUESTS
+    stats['pid'] = os.getpid()
+    return jsonify(stats)
+
+# Rendered pins are named after a hash of their PNG bytes, so the bytes behind a
+# URL never change; browsers and CDNs may therefore cache them for a year
+STATIC_MAX_AGE = 365 * 24 * 3600
 
 # Add a route to serve static files
 @app.route('/static/<path:filename>')
 def serve_static(filename):
-    static_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
-    return send_file(os.path.join(static_dir, filename))
-
-if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=5000) 
-
+    # Rendered pins are named after a hash of their bytes, which makes a strong ETag
+    # that stays the same across restarts and replicas (the default one is derived
+    # from the file's mtime)
+    name = os.path.splitext(os.path.basename(filename))[0]
+    etag = name[len('generated_'):] if name.startswith('generated_') else True
+    
+    # send_from_directory rejects paths that escape STATIC_DIR and answers
+    # conditional requests (If-None-Match / If-Modified-Since) with 304
+    return send_from_directory(STATIC_DIR, filename, max_age=STATIC_MAX_AGE, conditional=True, etag=etag)
 
-# Add at the end of app.py
 if __name__ == '__main__':
     # In production, don't use debug mode
     port = int(os.environ.get('PORT', 5000))
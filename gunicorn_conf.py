@@ -0,0 +1,24 @@
+# Gunicorn settings for production: gunicorn -c gunicorn_conf.py app:app
+#
+# gthread workers rather than gevent: a request mostly waits on Runware (on the
+# app's own aiohttp loop thread) and then renders on the Pillow thread pool, both
+# of which need real threads - gevent's monkey-patching would fight that event
+# loop and gain nothing for the CPU-bound rendering.
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+
+worker_class = 'gthread'
+
+# Few processes, each with many threads: every worker keeps its own font, mask and
+# tile caches and renders on all cores, so extra processes mostly duplicate memory
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+
+# A request thread is held for the whole Runware wait, so allow plenty of them;
+# MAX_INFLIGHT_REQUESTS still sheds load beyond what the worker can render
+threads = int(os.environ.get('GUNICORN_THREADS', 32))
+
+# Runware polling may take up to a minute, plus the download and the render
+timeout = 180
+graceful_timeout = 30
+keepalive = 5